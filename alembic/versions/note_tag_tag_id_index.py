@@ -0,0 +1,25 @@
+"""Index note_tag by tag
+
+Revision ID: e2a7c4d19b60
+Revises: 5c81e07f3a92
+Create Date: 2026-10-18 11:47:09.215873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a7c4d19b60'
+down_revision: Union[str, None] = '5c81e07f3a92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_note_tag_tag_id_note_id', 'note_tag', ['tag_id', 'note_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_note_tag_tag_id_note_id', table_name='note_tag')
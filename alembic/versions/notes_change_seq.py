@@ -0,0 +1,46 @@
+"""Note change sequence and tombstones for delta sync
+
+Revision ID: 3f6b1d84c2a7
+Revises: 1e9c4a7b3f60
+Create Date: 2026-10-18 14:22:03.518664
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6b1d84c2a7'
+down_revision: Union[str, None] = '1e9c4a7b3f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Константное значение по умолчанию не переписывает таблицу
+    op.add_column('users', sa.Column('change_seq', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('sync_horizon', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('notes', sa.Column('change_seq', sa.BigInteger(), server_default='0', nullable=False))
+
+    op.create_table('note_tombstones',
+    sa.Column('note_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('change_seq', sa.BigInteger(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('note_id')
+    )
+    op.create_index('ix_note_tombstones_user_id_change_seq_note_id', 'note_tombstones',
+                    ['user_id', 'change_seq', 'note_id'], unique=False)
+    op.create_index('ix_note_tombstones_deleted_at', 'note_tombstones', ['deleted_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_note_tombstones_deleted_at', table_name='note_tombstones')
+    op.drop_index('ix_note_tombstones_user_id_change_seq_note_id', table_name='note_tombstones')
+    op.drop_table('note_tombstones')
+    op.drop_column('notes', 'change_seq')
+    op.drop_column('users', 'sync_horizon')
+    op.drop_column('users', 'change_seq')
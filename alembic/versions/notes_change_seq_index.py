@@ -0,0 +1,29 @@
+"""Index notes by owner and change sequence
+
+Revision ID: c7e3a9150d28
+Revises: 3f6b1d84c2a7
+Create Date: 2026-10-18 14:24:37.902146
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e3a9150d28'
+down_revision: Union[str, None] = '3f6b1d84c2a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Отдельная ревизия: autocommit_block фиксирует предыдущие ревизии вместе с их отметкой
+    # в alembic_version, и сбой построения индекса не оставляет колонки без отметки
+    with op.get_context().autocommit_block():
+        op.create_index('ix_notes_user_id_change_seq_id', 'notes', ['user_id', 'change_seq', 'id'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notes_user_id_change_seq_id', table_name='notes')
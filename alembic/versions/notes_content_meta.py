@@ -0,0 +1,48 @@
+"""Note content length, hash and lz4 TOAST compression
+
+Revision ID: 6a9e2f04b7d3
+Revises: c7e3a9150d28
+Create Date: 2026-10-18 16:05:41.207319
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a9e2f04b7d3'
+down_revision: Union[str, None] = 'c7e3a9150d28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _lz4_supported() -> bool:
+    # До PostgreSQL 14 параметра нет, а сервер без lz4 перечисляет в нем только pglz
+    return bool(op.get_bind().execute(sa.text(
+        "SELECT 'lz4' = ANY(enumvals) FROM pg_settings WHERE name = 'default_toast_compression'"
+    )).scalar())
+
+
+def upgrade() -> None:
+    # Тексты длиннее toast_tuple_target сжимаются и уходят из строки в TOAST: списки и поиск,
+    # которые не выбирают content, читают только узкую строку. Уже сохраненные значения
+    # остаются в pglz до следующей записи
+    if _lz4_supported():
+        op.execute("ALTER TABLE notes ALTER COLUMN content SET COMPRESSION lz4")
+    op.execute("ALTER TABLE notes SET (toast_tuple_target = 512)")
+
+    # Генерируемые колонки переписывают таблицу под эксклюзивной блокировкой
+    op.add_column('notes', sa.Column('content_length', sa.Integer(),
+                                     sa.Computed("octet_length(content)", persisted=True), nullable=True))
+    op.add_column('notes', sa.Column('content_hash', sa.String(length=32),
+                                     sa.Computed("md5(content)", persisted=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('notes', 'content_hash')
+    op.drop_column('notes', 'content_length')
+    op.execute("ALTER TABLE notes RESET (toast_tuple_target)")
+    if _lz4_supported():
+        op.execute("ALTER TABLE notes ALTER COLUMN content SET COMPRESSION default")
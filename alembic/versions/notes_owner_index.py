@@ -0,0 +1,41 @@
+"""Drop redundant indexes, cascading note_tag
+
+Revision ID: 8d25c07a9e13
+Revises: b41f9d2e6c85
+Create Date: 2026-10-18 13:40:52.671204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d25c07a9e13'
+down_revision: Union[str, None] = 'b41f9d2e6c85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Индекс владельца строится в следующей ревизии, вне транзакции
+    # Дублируют первичные ключи
+    op.drop_index(op.f('ix_notes_id'), table_name='notes')
+    op.drop_index(op.f('ix_tags_id'), table_name='tags')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+
+    op.drop_constraint('note_tag_note_id_fkey', 'note_tag', type_='foreignkey')
+    op.drop_constraint('note_tag_tag_id_fkey', 'note_tag', type_='foreignkey')
+    op.create_foreign_key('note_tag_note_id_fkey', 'note_tag', 'notes', ['note_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('note_tag_tag_id_fkey', 'note_tag', 'tags', ['tag_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    op.drop_constraint('note_tag_tag_id_fkey', 'note_tag', type_='foreignkey')
+    op.drop_constraint('note_tag_note_id_fkey', 'note_tag', type_='foreignkey')
+    op.create_foreign_key('note_tag_tag_id_fkey', 'note_tag', 'tags', ['tag_id'], ['id'])
+    op.create_foreign_key('note_tag_note_id_fkey', 'note_tag', 'notes', ['note_id'], ['id'])
+
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_index(op.f('ix_tags_id'), 'tags', ['id'], unique=False)
+    op.create_index(op.f('ix_notes_id'), 'notes', ['id'], unique=False)
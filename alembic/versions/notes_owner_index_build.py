@@ -0,0 +1,32 @@
+"""Index notes by owner and update time
+
+Revision ID: 1e9c4a7b3f60
+Revises: 8d25c07a9e13
+Create Date: 2026-10-18 13:41:26.318570
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1e9c4a7b3f60'
+down_revision: Union[str, None] = '8d25c07a9e13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Без блокировки записи в notes на время построения индекса. Отдельная ревизия:
+    # autocommit_block фиксирует предыдущие ревизии вместе с их отметкой в alembic_version,
+    # и сбой построения индекса не оставляет удаленные индексы и ключи без отметки
+    with op.get_context().autocommit_block():
+        op.create_index('ix_notes_user_id_updated_at_id', 'notes',
+                        ['user_id', sa.text('updated_at DESC'), sa.text('id DESC')],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notes_user_id_updated_at_id', table_name='notes')
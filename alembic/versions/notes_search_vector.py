@@ -0,0 +1,40 @@
+"""Notes full-text search vector
+
+Revision ID: 5c81e07f3a92
+Revises: 9b3f6a1c2d47
+Create Date: 2026-10-18 11:04:52.730144
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c81e07f3a92'
+down_revision: Union[str, None] = '9b3f6a1c2d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('notes', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(content, '')), 'B')",
+            persisted=True,
+        ),
+        nullable=True,
+    ))
+    op.create_index('ix_notes_search_vector', 'notes', ['search_vector'], unique=False, postgresql_using='gin')
+    op.drop_index(op.f('ix_notes_title'), table_name='notes')
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_notes_title'), 'notes', ['title'], unique=False)
+    op.drop_index('ix_notes_search_vector', table_name='notes', postgresql_using='gin')
+    op.drop_column('notes', 'search_vector')
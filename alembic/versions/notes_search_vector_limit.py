@@ -0,0 +1,47 @@
+"""Index only the first 100000 characters of a note for search
+
+Revision ID: 2d8b5f71c9e4
+Revises: 6a9e2f04b7d3
+Create Date: 2026-10-18 17:12:08.415926
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d8b5f71c9e4'
+down_revision: Union[str, None] = '6a9e2f04b7d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _add_search_vector(title: str, content: str) -> None:
+    op.add_column('notes', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            f"setweight(to_tsvector('simple', {title}), 'A') || "
+            f"setweight(to_tsvector('simple', {content}), 'B')",
+            persisted=True,
+        ),
+        nullable=True,
+    ))
+    op.create_index('ix_notes_search_vector', 'notes', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def upgrade() -> None:
+    # Выражение генерируемой колонки до PostgreSQL 17 не меняется на месте: колонка
+    # пересоздается вместе с индексом, таблица переписывается под эксклюзивной блокировкой
+    op.drop_index('ix_notes_search_vector', table_name='notes', postgresql_using='gin')
+    op.drop_column('notes', 'search_vector')
+    _add_search_vector("left(coalesce(title, ''), 100000)", "left(coalesce(content, ''), 100000)")
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notes_search_vector', table_name='notes', postgresql_using='gin')
+    op.drop_column('notes', 'search_vector')
+    _add_search_vector("coalesce(title, '')", "coalesce(content, '')")
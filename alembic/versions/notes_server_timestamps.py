@@ -0,0 +1,28 @@
+"""Server-side note timestamps
+
+Revision ID: 73d0b5e8a1f4
+Revises: e2a7c4d19b60
+Create Date: 2026-10-18 12:31:45.902316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '73d0b5e8a1f4'
+down_revision: Union[str, None] = 'e2a7c4d19b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('notes', 'created_at', server_default=sa.text("timezone('utc', now())"))
+    op.alter_column('notes', 'updated_at', server_default=sa.text("timezone('utc', now())"))
+
+
+def downgrade() -> None:
+    op.alter_column('notes', 'updated_at', server_default=None)
+    op.alter_column('notes', 'created_at', server_default=None)
@@ -0,0 +1,51 @@
+"""Unique tag name
+
+Revision ID: 9b3f6a1c2d47
+Revises: 4e1d8c248bba
+Create Date: 2026-10-18 10:12:31.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3f6a1c2d47'
+down_revision: Union[str, None] = '4e1d8c248bba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Для каждого имени оставляем тег с минимальным id
+KEEP_TAGS = "SELECT name, min(id) AS id FROM tags GROUP BY name HAVING count(*) > 1"
+
+
+def upgrade() -> None:
+    # Переносим связи дублирующихся тегов на оставляемый тег и удаляем дубли
+    op.execute(f"""
+        INSERT INTO note_tag (note_id, tag_id)
+        SELECT nt.note_id, keep.id
+        FROM note_tag nt
+        JOIN tags t ON t.id = nt.tag_id
+        JOIN ({KEEP_TAGS}) keep ON keep.name = t.name AND keep.id <> t.id
+        ON CONFLICT DO NOTHING
+    """)
+    op.execute(f"""
+        DELETE FROM note_tag nt
+        USING tags t, ({KEEP_TAGS}) keep
+        WHERE t.id = nt.tag_id AND keep.name = t.name AND keep.id <> t.id
+    """)
+    op.execute(f"""
+        DELETE FROM tags t
+        USING ({KEEP_TAGS}) keep
+        WHERE keep.name = t.name AND keep.id <> t.id
+    """)
+
+    op.drop_index(op.f('ix_tags_name'), table_name='tags')
+    op.create_index(op.f('ix_tags_name'), 'tags', ['name'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_tags_name'), table_name='tags')
+    op.create_index(op.f('ix_tags_name'), 'tags', ['name'], unique=False)
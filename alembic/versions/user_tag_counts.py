@@ -0,0 +1,39 @@
+"""Per-user tag counts
+
+Revision ID: b41f9d2e6c85
+Revises: 73d0b5e8a1f4
+Create Date: 2026-10-18 13:02:17.418903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41f9d2e6c85'
+down_revision: Union[str, None] = '73d0b5e8a1f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_tag_counts',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'tag_id')
+    )
+    # Счетчики для уже существующих заметок
+    op.execute(
+        "INSERT INTO user_tag_counts (user_id, tag_id, count) "
+        "SELECT n.user_id, nt.tag_id, count(*) FROM note_tag nt JOIN notes n ON n.id = nt.note_id "
+        "WHERE n.user_id IS NOT NULL GROUP BY n.user_id, nt.tag_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_tag_counts')
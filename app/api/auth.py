@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Dict
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from jose import JWTError, jwt
+from jose import JWTError
 from app.db.session import get_db
-from app.db import models
+from app.db.users import notify_registered, registered_users
+from app.db import models, queries
 from app.schemas import user as schemas
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.cache import TTLCache
+from app.core.security import verify_password_async, get_password_hash_async, create_access_token, decode_access_token, token_ttl
 from config import settings
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.security import OAuth2PasswordRequestForm
@@ -13,39 +16,59 @@ from fastapi.security import OAuth2PasswordRequestForm
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 router = APIRouter()
 
+# Аутентифицированные пользователи по telegram_id из поля sub токена
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(telegram_id: str) -> None:
+    user_cache.invalidate(telegram_id)
+    registered_users.invalidate(telegram_id)
+
 
 # Регистрация пользователя
 @router.post("/register", response_model=schemas.User)
 async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(models.User).filter(models.User.telegram_id == user.telegram_id))
+    result = await db.execute(queries.USER_BY_TELEGRAM_ID, {"telegram_id": user.telegram_id})
     existing_user = result.scalar()
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Telegram ID already registered")
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = models.User(telegram_id=user.telegram_id, hashed_password=hashed_password)
     db.add(db_user)
+    await notify_registered(db, db_user.telegram_id)
     await db.commit()
-    await db.refresh(db_user)
-    return schemas.User.from_orm(db_user)
+    invalidate_user(db_user.telegram_id)
+    registered_users.add(db_user.telegram_id)
+    return schemas.User.model_validate(db_user)
 
 
 @router.post("/login", response_model=schemas.UserWithToken)
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     telegram_id = form_data.username
 
-    result = await db.execute(select(models.User).filter(models.User.telegram_id == telegram_id))
+    result = await db.execute(queries.USER_BY_TELEGRAM_ID, {"telegram_id": telegram_id})
     db_user = result.scalar()
 
-    if not db_user or not verify_password(form_data.password, db_user.hashed_password):
+    if not db_user:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect Telegram ID or password")
+
+    valid, new_hash = await verify_password_async(form_data.password, db_user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect Telegram ID or password")
 
-    access_token = create_access_token({"sub": db_user.telegram_id})
+    user = schemas.User.model_validate(db_user)
+    access_token = create_access_token({"sub": user.telegram_id})
+
+    # Прозрачно перехэшируем пароль с актуальной стоимостью bcrypt
+    if new_hash:
+        db_user.hashed_password = new_hash
+        await db.commit()
 
     return {
         "access_token": access_token,
         "token_type": "bearer",
-        "user": schemas.User.from_orm(db_user)
+        "user": user
     }
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
@@ -55,26 +78,46 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        print(f"Token received: {token}")
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_access_token(token)
         telegram_id: str = payload.get("sub")
-        print('Token id', telegram_id)
         if telegram_id is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    result = await db.execute(select(models.User).filter(models.User.telegram_id == telegram_id))
-    user = result.scalar()
-    if user is None:
+    user = user_cache.get(telegram_id)
+    if user is not None:
+        return user
+
+    result = await db.execute(queries.USER_BY_TELEGRAM_ID, {"telegram_id": telegram_id})
+    db_user = result.scalar()
+    # Соединение возвращается в пул сразу: обработчик с отдельной сессией чтения
+    # не должен ждать второе соединение, пока первое простаивает
+    await db.close()
+    if db_user is None:
         raise credentials_exception
+
+    # В кэше храним отвязанный от сессии снимок, а не ORM-объект
+    user = schemas.User.model_validate(db_user)
+    user_cache.set(telegram_id, user, ttl=token_ttl(payload))
     return user
 
 
-@router.get("/check_user/{telegram_id}", response_model=bool)
-async def check_user(telegram_id: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(models.User).filter(models.User.telegram_id == telegram_id))
-    user = result.scalar()
+# HEAD отвечает без тела: 200, если пользователь существует, иначе 404
+@router.api_route("/check_user/{telegram_id}", methods=["GET", "HEAD"], response_model=bool)
+async def check_user(telegram_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    found = await registered_users.exists(db, telegram_id)
+    if request.method == "HEAD":
+        return Response(status_code=status.HTTP_200_OK if found else status.HTTP_404_NOT_FOUND)
 
     # Возвращаем True если пользователь существует, иначе False
-    return bool(user)
\ No newline at end of file
+    return found
+
+
+# Проверка сразу нескольких telegram_id, например всех участников чата
+@router.post("/check_users", response_model=Dict[str, bool])
+async def check_users(check: schemas.UserCheck, db: AsyncSession = Depends(get_db)):
+    if len(check.telegram_ids) > settings.USER_CHECK_MAX_BATCH:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Batch is limited to {settings.USER_CHECK_MAX_BATCH} ids")
+    return await registered_users.exists_many(db, check.telegram_ids)
\ No newline at end of file
@@ -0,0 +1,197 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import Integer, String, Text, column, func, insert, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db import models
+from app.db.notes import delete_notes
+from app.db.sync import change_seq, notify_change
+from app.db.tags import resolve_tags, get_tags, link_tags, unlink_tags, note_tags_json
+from app.schemas import note as schemas
+from app.schemas import user as user_schemas
+from app.db.session import get_db
+from app.api.auth import get_current_user
+from app.core.ratelimit import rate_limiter
+from app.core.response_cache import response_cache
+from config import settings
+
+router = APIRouter()
+
+
+async def _charge(request: Request, size: int) -> None:
+    if size > settings.NOTES_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Batch is limited to {settings.NOTES_BATCH_MAX_SIZE} operations")
+    # Пакет списывает с лимита столько, сколько в нем операций; один вызов уже учтен глобально
+    await rate_limiter.check(request, cost=size - 1)
+
+
+@router.post("/create", response_model=schemas.BatchResult)
+async def batch_create_notes(batch: schemas.NoteBatchCreate,
+                             request: Request,
+                             db: AsyncSession = Depends(get_db),
+                             current_user: user_schemas.User = Depends(get_current_user)):
+    await _charge(request, len(batch.notes))
+    if not batch.notes:
+        return schemas.BatchResult(results=[])
+
+    # Все заметки одним многострочным INSERT ... RETURNING в порядке параметров
+    seq = await change_seq(db, current_user.id)
+    result = await db.execute(
+        insert(models.Note).returning(models.Note.id, models.Note.created_at, models.Note.updated_at,
+                                      models.Note.content_length, models.Note.content_hash,
+                                      sort_by_parameter_order=True),
+        [{"title": note.title, "content": note.content, "user_id": current_user.id, "change_seq": seq}
+         for note in batch.notes],
+    )
+    rows = result.all()
+
+    # Теги всего пакета разрешаются вместе
+    tags = {tag.name: tag for tag in await resolve_tags(db, [name for note in batch.notes for name in note.tags])}
+    await link_tags(db, current_user.id, [(row.id, tags[name].id) for note, row in zip(batch.notes, rows) for name in note.tags],
+                    touch=False)
+    await notify_change(db, current_user.id, "create", [row.id for row in rows])
+
+    await db.commit()
+    await response_cache.invalidate_user(current_user.id)
+
+    results = []
+    for index, (note, row) in enumerate(zip(batch.notes, rows)):
+        note_tags = [schemas.Tag(id=tags[name].id, name=name) for name in dict.fromkeys(note.tags)]
+        results.append(schemas.BatchItemResult(
+            index=index, ok=True, note_id=row.id,
+            note=schemas.Note(id=row.id, title=note.title, content=note.content,
+                              content_length=row.content_length, content_hash=row.content_hash,
+                              created_at=row.created_at, updated_at=row.updated_at, tags=note_tags),
+        ))
+    return schemas.BatchResult(results=results)
+
+
+@router.post("/update", response_model=schemas.BatchResult)
+async def batch_update_notes(batch: schemas.NoteBatchUpdate,
+                             request: Request,
+                             db: AsyncSession = Depends(get_db),
+                             current_user: user_schemas.User = Depends(get_current_user)):
+    await _charge(request, len(batch.notes))
+
+    errors = {}
+    changes = {}
+    for index, item in enumerate(batch.notes):
+        if item.id in changes:
+            errors[index] = "Duplicate note id in batch"
+        elif item.title is None and item.content is None:
+            errors[index] = "Nothing to update"
+        else:
+            changes[item.id] = item
+
+    updated = {}
+    if changes:
+        # UPDATE ... FROM (VALUES ...): один запрос на весь пакет
+        data = values(column("id", Integer), column("title", String), column("content", Text), name="data").data(
+            [(item.id, item.title, item.content) for item in changes.values()])
+        stmt = (update(models.Note)
+                .where(models.Note.id == data.c.id, models.Note.user_id == current_user.id)
+                .values(title=func.coalesce(data.c.title, models.Note.title),
+                        content=func.coalesce(data.c.content, models.Note.content),
+                        change_seq=await change_seq(db, current_user.id))
+                .returning(models.Note.id, models.Note.title, models.Note.content,
+                           models.Note.content_length, models.Note.content_hash,
+                           models.Note.created_at, models.Note.updated_at,
+                           note_tags_json(models.Note.id).label("tags"))
+                .execution_options(synchronize_session=False))
+        result = await db.execute(stmt)
+        updated = {row.id: row for row in result.all()}
+        if updated:
+            await notify_change(db, current_user.id, "update", list(updated))
+
+        await db.commit()
+        await response_cache.invalidate_user(current_user.id)
+
+    results = []
+    for index, item in enumerate(batch.notes):
+        if index in errors:
+            results.append(schemas.BatchItemResult(index=index, ok=False, note_id=item.id, error=errors[index]))
+        elif item.id not in updated:
+            results.append(schemas.BatchItemResult(index=index, ok=False, note_id=item.id, error="Note not found"))
+        else:
+            note = schemas.Note.model_validate(dict(updated[item.id]._mapping))
+            results.append(schemas.BatchItemResult(index=index, ok=True, note_id=item.id, note=note))
+    return schemas.BatchResult(results=results)
+
+
+@router.post("/delete", response_model=schemas.BatchResult)
+async def batch_delete_notes(batch: schemas.NoteBatchDelete,
+                             request: Request,
+                             db: AsyncSession = Depends(get_db),
+                             current_user: user_schemas.User = Depends(get_current_user)):
+    await _charge(request, len(batch.ids))
+
+    deleted = set(await delete_notes(db, current_user.id, list(dict.fromkeys(batch.ids))))
+    if deleted:
+        await notify_change(db, current_user.id, "delete", sorted(deleted))
+        await db.commit()
+        await response_cache.invalidate_user(current_user.id)
+
+    results = []
+    seen = set()
+    for index, note_id in enumerate(batch.ids):
+        if note_id in seen:
+            results.append(schemas.BatchItemResult(index=index, ok=False, note_id=note_id,
+                                                   error="Duplicate note id in batch"))
+        elif note_id not in deleted:
+            results.append(schemas.BatchItemResult(index=index, ok=False, note_id=note_id, error="Note not found"))
+        else:
+            results.append(schemas.BatchItemResult(index=index, ok=True, note_id=note_id))
+        seen.add(note_id)
+    return schemas.BatchResult(results=results)
+
+
+@router.post("/tags", response_model=schemas.BatchResult)
+async def batch_tag_notes(batch: schemas.NoteBatchTags,
+                          request: Request,
+                          db: AsyncSession = Depends(get_db),
+                          current_user: user_schemas.User = Depends(get_current_user)):
+    await _charge(request, len(batch.operations))
+    operations = batch.operations
+    if not operations:
+        return schemas.BatchResult(results=[])
+
+    result = await db.execute(select(models.Note.id).where(
+        models.Note.id.in_(list({op.note_id for op in operations})),
+        models.Note.user_id == current_user.id,
+    ))
+    owned = set(result.scalars().all())
+
+    adds = [op for op in operations if op.action == "add" and op.note_id in owned]
+    removes = [op for op in operations if op.action == "remove" and op.note_id in owned]
+    if adds or removes:
+        await change_seq(db, current_user.id)
+
+    added_tags = {tag.name: tag.id for tag in await resolve_tags(db, [op.tag for op in adds])}
+    removed_tags = {tag.name: tag.id for tag in await get_tags(db, [op.tag for op in removes])}
+
+    added = await link_tags(db, current_user.id, [(op.note_id, added_tags[op.tag]) for op in adds])
+
+    removed = await unlink_tags(db, current_user.id,
+                                [(op.note_id, removed_tags[op.tag]) for op in removes if op.tag in removed_tags])
+    if added or removed:
+        await notify_change(db, current_user.id, "tags", sorted({note_id for note_id, _ in added | removed}))
+
+    await db.commit()
+    if added or removed:
+        await response_cache.invalidate_user(current_user.id)
+
+    results = []
+    for index, op in enumerate(operations):
+        if op.note_id not in owned:
+            error = "Note not found"
+        elif op.action == "add":
+            pair = (op.note_id, added_tags[op.tag])
+            error = None if pair in added else "Tag already added to the note"
+            added.discard(pair)
+        else:
+            pair = (op.note_id, removed_tags.get(op.tag))
+            error = None if pair in removed else "Tag not found on the note"
+            removed.discard(pair)
+        results.append(schemas.BatchItemResult(index=index, ok=error is None, note_id=op.note_id, error=error))
+    return schemas.BatchResult(results=results)
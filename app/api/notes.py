@@ -1,165 +1,447 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import time
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import func, insert, null, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 
-from app.db import models
+from app.db import models, queries
+from app.db.notes import delete_notes
+from app.db.sync import change_seq, notify_change
+from app.db.tags import resolve_tags, get_tags, attach_tags, link_tags, unlink_tags, notes_with_tags
 from app.schemas import note as schemas
-from app.db.session import get_db
+from app.schemas import user as user_schemas
+from app.db.session import get_db, get_read_db, ReadSessionLocal
 from app.api.auth import get_current_user
-from typing import List
+from app.core.pagination import encode_cursor, decode_cursor, encode_sync_cursor, decode_sync_cursor
+from app.core.changes import change_hub
+from app.core.response_cache import cached_json, etag_matches, response_cache
+from app.core.singleflight import single_flight
+from config import settings
+from typing import List, Optional, Union
 
 router = APIRouter()
 
 
-@router.get("/notes/", response_model=List[schemas.Note])
-async def get_notes(tag: str = None,
-                    db: AsyncSession = Depends(get_db),
-                    current_user: models.User = Depends(get_current_user)):
-    query = select(models.Note).where(models.Note.user_id == current_user.id).options(selectinload(models.Note.tags))
+NOTE_FIELDS = tuple(queries.NOTE_COLUMNS)
+
+
+def _parse_fields(fields: Optional[str], include_content: bool = True) -> List[str]:
+    if not fields:
+        return list(NOTE_FIELDS if include_content else queries.NOTE_HEADER_FIELDS)
+
+    selected = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = set(selected) - set(NOTE_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [field for field in selected if include_content or field != "content"]
+
+
+def _note_item(row, fields: List[str]) -> dict:
+    # Строка запроса сразу превращается в JSON, минуя ORM-объекты и валидацию Pydantic
+    mapping = row._mapping
+    return {field: mapping[field] for field in fields}
 
+
+async def _stream_notes(query, params: dict, fields: List[str]):
+    # Сессия зависимости get_db закрывается до отправки тела, поэтому открываем свою
+    async with ReadSessionLocal() as db:
+        result = await db.stream(query, params, execution_options={"yield_per": settings.NOTES_STREAM_BATCH_SIZE})
+        async for row in result:
+            yield orjson.dumps(_note_item(row, fields)) + b"\n"
+
+
+# Без cursor и limit ответ, как и раньше, - массив всех заметок; страницы NotePage
+# отдаются только тем, кто передал limit или cursor
+@router.get("/notes/", response_model=Union[List[schemas.NoteItem], schemas.NotePage],
+            response_model_exclude_unset=True)
+async def get_notes(request: Request,
+                    tag: str = None,
+                    cursor: Optional[str] = None,
+                    limit: Optional[int] = Query(None, ge=1, le=settings.NOTES_MAX_PAGE_SIZE),
+                    fields: Optional[str] = None,
+                    include_content: bool = True,
+                    format: str = Query("json", pattern="^(json|ndjson)$"),
+                    db: AsyncSession = Depends(get_read_db),
+                    current_user: user_schemas.User = Depends(get_current_user)):
+    selected = _parse_fields(fields, include_content)
+
+    params = {"user_id": current_user.id}
     if tag:
-        query = query.filter(models.Note.tags.any(models.Tag.name == tag))
+        params["tag"] = tag
+    if cursor:
+        try:
+            params["cursor_updated_at"], params["cursor_id"] = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    if format == "ndjson":
+        if limit:
+            params["limit"] = limit
+        query = queries.notes_by_owner(tuple(selected), bool(tag), bool(cursor), bool(limit))
+        return StreamingResponse(_stream_notes(query, params, selected), media_type="application/x-ndjson")
+
+    if not (cursor or limit):
+        query = queries.notes_by_owner(tuple(selected), bool(tag), False, False)
 
-    result = await db.execute(query)
-    return result.scalars().all()
+        async def produce_all() -> bytes:
+            result = await db.execute(query, params)
+            return orjson.dumps([_note_item(row, selected) for row in result.all()])
+
+        return await cached_json(request, current_user.id, "notes_all", {"tag": tag, "fields": selected},
+                                 produce_all)
+
+    limit = limit or settings.NOTES_PAGE_SIZE
+
+    query = queries.notes_by_owner(tuple(selected), bool(tag), bool(cursor), True)
+    params["limit"] = limit + 1
+
+    async def produce() -> bytes:
+        result = await db.execute(query, params)
+        rows = result.all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].updated_at, rows[-1].id)
+
+        return orjson.dumps({"items": [_note_item(row, selected) for row in rows], "next_cursor": next_cursor})
+
+    cache_params = {"tag": tag, "cursor": cursor, "limit": limit, "fields": selected}
+    return await cached_json(request, current_user.id, "notes", cache_params, produce)
 
 
 @router.post("/notes/", response_model=schemas.Note)
 async def create_note(note: schemas.NoteCreate,
                       db: AsyncSession = Depends(get_db),
-                      current_user: models.User = Depends(get_current_user)):
-    db_note = models.Note(title=note.title, content=note.content, user_id=current_user.id)
-
-    for tag_name in note.tags:
-        tag_result = await db.execute(select(models.Tag).filter(models.Tag.name == tag_name))
-        tag = tag_result.scalar()
-        if tag:
-            db_note.tags.append(tag)
-        else:
-            new_tag = models.Tag(name=tag_name)
-            db.add(new_tag)
-            db_note.tags.append(new_tag)
-
-    db.add(db_note)
-    await db.commit()
-    await db.refresh(db_note)
-
-    await db.execute(select(models.Note).options(selectinload(models.Note.tags)).filter(models.Note.id == db_note.id))
+                      current_user: user_schemas.User = Depends(get_current_user)):
+    # INSERT ... RETURNING только нужных колонок: flush вернул бы еще и весь search_vector
+    result = await db.execute(
+        insert(models.Note).returning(models.Note.id, models.Note.created_at, models.Note.updated_at,
+                                      models.Note.content_length, models.Note.content_hash),
+        {"title": note.title, "content": note.content, "user_id": current_user.id,
+         "change_seq": await change_seq(db, current_user.id)},
+    )
+    row = result.one()
+
+    tags = await resolve_tags(db, note.tags)
+    await attach_tags(db, current_user.id, row.id, tags)
+    await notify_change(db, current_user.id, "create", [row.id])
 
-    return db_note
+    await db.commit()
+    await response_cache.invalidate_user(current_user.id)
+
+    return schemas.Note(id=row.id, title=note.title, content=note.content,
+                        content_length=row.content_length, content_hash=row.content_hash,
+                        created_at=row.created_at, updated_at=row.updated_at,
+                        tags=[schemas.Tag(id=tag.id, name=tag.name) for tag in tags])
+
+
+# Изменения после курсора: одна проверка горизонта и два диапазонных чтения по индексам
+@router.get("/sync", response_model=schemas.NoteSync)
+async def sync_notes(request: Request,
+                     since: Optional[str] = None,
+                     limit: Optional[int] = Query(None, ge=1, le=settings.NOTES_MAX_PAGE_SIZE),
+                     include_content: bool = True,
+                     db: AsyncSession = Depends(get_read_db),
+                     current_user: user_schemas.User = Depends(get_current_user)):
+    changes_query, fields = ((queries.NOTE_CHANGES, NOTE_FIELDS) if include_content
+                             else (queries.NOTE_CHANGE_HEADERS, queries.NOTE_HEADER_FIELDS))
+    since_seq, since_id = 0, 0
+    if since:
+        try:
+            since_seq, since_id = decode_sync_cursor(since)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    limit = limit or settings.NOTES_PAGE_SIZE
+    params = {"user_id": current_user.id, "since_seq": since_seq, "since_id": since_id, "limit": limit + 1}
+
+    async def produce() -> bytes:
+        if since:
+            horizon = (await db.execute(queries.SYNC_HORIZON, {"user_id": current_user.id})).scalar() or 0
+            if since_seq < horizon:
+                return orjson.dumps({"changes": [], "deleted": [], "next_cursor": None,
+                                     "has_more": False, "reset": True})
+
+        events = [(row.change_seq, row.id, row) for row in (await db.execute(changes_query, params)).all()]
+        # При первой синхронизации удалять на клиенте нечего
+        if since:
+            result = await db.execute(queries.NOTE_DELETIONS, params)
+            events += [(seq, note_id, None) for note_id, seq in result.all()]
+        events.sort(key=lambda event: event[:2])
+
+        has_more = len(events) > limit
+        events = events[:limit]
+        next_cursor = encode_sync_cursor(*events[-1][:2]) if events else encode_sync_cursor(since_seq, since_id)
+
+        return orjson.dumps({
+            "changes": [_note_item(row, fields) for _, _, row in events if row is not None],
+            "deleted": [note_id for _, note_id, row in events if row is None],
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+            "reset": False,
+        })
+
+    cache_params = {"since": since, "limit": limit, "include_content": include_content}
+    return await cached_json(request, current_user.id, "sync", cache_params, produce)
+
+
+async def _event_stream(subscriber):
+    # Поток ограничен по времени: клиенты переподключаются и распределяются по воркерам,
+    # а остановка воркера не ждет бесконечных ответов
+    deadline = time.monotonic() + settings.NOTES_STREAM_MAX_SECONDS
+    try:
+        yield b"retry: 3000\n\n"
+        while not subscriber.dropped.is_set() and time.monotonic() < deadline:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), settings.NOTES_STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Комментарий SSE не дает прокси закрыть простаивающее соединение
+                yield b": ping\n\n"
+                continue
+            yield b"event: " + event["event"].encode() + b"\ndata: " + orjson.dumps(event) + b"\n\n"
+
+        # Отключенный клиент мог пропустить события и должен догнать их через /notes/sync
+        yield b"event: resync\ndata: {}\n\n" if subscriber.dropped.is_set() else b"event: reconnect\ndata: {}\n\n"
+    finally:
+        change_hub.unsubscribe(subscriber)
+
+
+# События изменений заметок пользователя (Server-Sent Events); данные забираются через /notes/sync
+@router.get("/stream")
+async def stream_changes(current_user: user_schemas.User = Depends(get_current_user)):
+    subscriber = change_hub.subscribe(current_user.id)
+    if subscriber is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Too many open streams, try again later", headers={"Retry-After": "5"})
+
+    return StreamingResponse(_event_stream(subscriber), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def _tag_ids(db: AsyncSession, tags: str, mode: str) -> Optional[List[int]]:
+    """id тегов для фильтра или None, если под фильтр ничего не подходит."""
+    tag_names = set(tags.split())
+    tag_ids = [tag.id for tag in await get_tags(db, tag_names)]
+
+    # Для режима all каждый запрошенный тег должен существовать
+    if not tag_ids or (mode == "all" and len(tag_ids) < len(tag_names)):
+        return None
+    return tag_ids
 
 
 # Новый маршрут для поиска заметок по нескольким тегам
 @router.get("/notes/search", response_model=list[schemas.Note])
 async def search_notes_by_tags(tags: str,
-                               db: AsyncSession = Depends(get_db),
-                               current_user: models.User = Depends(get_current_user)):
-    # Разделяем теги по пробелам
-    tag_list = tags.split()
-
-    # Ищем заметки, которые содержат хотя бы один из тегов
-    stmt = (select(models.Note)
-            .join(models.Note.tags)
-            .filter(models.Tag.name.in_(tag_list))
+                               mode: str = Query("any", pattern="^(any|all)$"),
+                               include_content: bool = True,
+                               db: AsyncSession = Depends(get_read_db),
+                               current_user: user_schemas.User = Depends(get_current_user)):
+    async def produce() -> bytes:
+        # Разделяем теги по пробелам; mode=any - хотя бы один тег, mode=all - все теги
+        tag_ids = await _tag_ids(db, tags, mode)
+        if tag_ids is None:
+            return b"[]"
+
+        result = await db.execute(queries.notes_by_tags(mode, tuple(_parse_fields(None, include_content))),
+                                  {"user_id": current_user.id, "tag_ids": tag_ids, "tag_count": len(tag_ids)})
+        return orjson.dumps([dict(row._mapping) for row in result.all()])
+
+    # Поиск не кэшируется в Redis, но одинаковые параллельные запросы выполняются один раз
+    key = (tuple(sorted(set(tags.split()))), mode, include_content)
+    body = await single_flight.do(current_user.id, "search_tags", key, produce)
+    return Response(content=body, media_type="application/json")
+
+
+# Полнотекстовый поиск по заголовку и тексту, ранжированный по ts_rank
+@router.get("/notes/search/text", response_model=List[schemas.NoteSearchResult])
+async def search_notes_by_text(q: str,
+                               tags: Optional[str] = None,
+                               mode: str = Query("any", pattern="^(any|all)$"),
+                               highlight: bool = False,
+                               include_content: bool = True,
+                               limit: int = Query(50, ge=1, le=settings.NOTES_MAX_PAGE_SIZE),
+                               db: AsyncSession = Depends(get_read_db),
+                               current_user: user_schemas.User = Depends(get_current_user)):
+    ts_query = func.websearch_to_tsquery(models.SEARCH_CONFIG, q)
+    rank = func.ts_rank(models.Note.search_vector, ts_query).label("rank")
+
+    if highlight:
+        snippet = func.ts_headline(models.SEARCH_CONFIG, func.coalesce(models.Note.content, ""), ts_query,
+                                   "StartSel=<mark>, StopSel=</mark>, MaxFragments=2")
+    else:
+        snippet = null()
+
+    columns = queries.note_columns(tuple(_parse_fields(None, include_content)))
+    stmt = (select(*columns, rank, snippet.label("snippet"))
             .filter(models.Note.user_id == current_user.id)
-            .options(selectinload(models.Note.tags))
-            .distinct())
+            .filter(models.Note.search_vector.op("@@")(ts_query))
+            .order_by(rank.desc(), models.Note.id.desc())
+            .limit(limit))
 
-    result = await db.execute(stmt)
-    notes = result.scalars().all()
+    if tags:
+        tag_ids = await _tag_ids(db, tags, mode)
+        if tag_ids is None:
+            return []
+        stmt = stmt.filter(models.Note.id.in_(notes_with_tags(tag_ids, mode)))
 
-    return notes
+    result = await db.execute(stmt)
+    return ORJSONResponse([dict(row._mapping) for row in result.all()])
 
 
 @router.get("/notes/{note_id}", response_model=schemas.Note)
 async def get_note_by_id(note_id: int,
-                         db: AsyncSession = Depends(get_db),
-                         current_user: models.User = Depends(get_current_user)):
-    result = await db.execute(select(models.Note).filter(models.Note.id == note_id,
-                models.Note.user_id == current_user.id).options(selectinload(models.Note.tags)))
-    db_note = result.scalar()
-
-    if not db_note:
+                         request: Request,
+                         include_content: bool = True,
+                         db: AsyncSession = Depends(get_read_db),
+                         current_user: user_schemas.User = Depends(get_current_user)):
+    query = queries.NOTE_ROW_BY_OWNER if include_content else queries.NOTE_HEADER_BY_OWNER
+
+    async def produce() -> bytes:
+        result = await db.execute(query, {"note_id": note_id, "user_id": current_user.id})
+        row = result.first()
+
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not found")
+
+        return orjson.dumps(dict(row._mapping))
+
+    cache_params = {"id": note_id, "include_content": include_content}
+    return await cached_json(request, current_user.id, "note", cache_params, produce)
+
+
+# Текст заметки как есть, без JSON и кэша ответов; ETag - md5 текста
+@router.get("/notes/{note_id}/content", response_class=Response)
+async def get_note_content(note_id: int,
+                           request: Request,
+                           db: AsyncSession = Depends(get_read_db),
+                           current_user: user_schemas.User = Depends(get_current_user)):
+    params = {"note_id": note_id, "user_id": current_user.id}
+    row = (await db.execute(queries.NOTE_CONTENT_HASH_BY_OWNER, params)).first()
+    if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not found")
 
-    return db_note
+    headers = {"ETag": f'"{row.content_hash}"'} if row.content_hash else {}
+    if headers and etag_matches(request, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    content = (await db.execute(queries.NOTE_CONTENT_BY_OWNER, params)).scalar() or ""
+    return Response(content=content.encode(), media_type="text/plain; charset=utf-8", headers=headers)
 
 @router.put("/notes/{note_id}", response_model=schemas.Note)
 async def update_note(note_id: int,
                       note_update: schemas.NoteUpdate,
+                      include_content: bool = True,
                       db: AsyncSession = Depends(get_db),
-                      current_user: models.User = Depends(get_current_user)):
-    result = await db.execute(select(models.Note).filter(models.Note.id == note_id,
-                models.Note.user_id == current_user.id).options(selectinload(models.Note.tags)))
-    db_note = result.scalar()
+                      current_user: user_schemas.User = Depends(get_current_user)):
+    columns = queries.note_columns(tuple(_parse_fields(None, include_content)))
+    values = note_update.model_dump(exclude_none=True)
+
+    # Один UPDATE ... RETURNING вместо SELECT, UPDATE и refresh()
+    if values:
+        values["change_seq"] = await change_seq(db, current_user.id)
+        stmt = (update(models.Note)
+                .where(models.Note.id == note_id, models.Note.user_id == current_user.id)
+                .values(**values)
+                .returning(*columns)
+                .execution_options(synchronize_session=False))
+    else:
+        stmt = select(*columns).where(models.Note.id == note_id, models.Note.user_id == current_user.id)
 
-    if not db_note:
+    result = await db.execute(stmt)
+    row = result.first()
+
+    if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not found")
 
-    if note_update.title is not None:
-        db_note.title = note_update.title
-    if note_update.content is not None:
-        db_note.content = note_update.content
+    if values:
+        await notify_change(db, current_user.id, "update", [note_id])
+    await db.commit()
+    await response_cache.invalidate_user(current_user.id)
+
+    return schemas.Note.model_validate(dict(row._mapping))
 
+@router.delete("/notes/{note_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_note(note_id: int,
+                      db: AsyncSession = Depends(get_db),
+                      current_user: user_schemas.User = Depends(get_current_user)):
+    if not await delete_notes(db, current_user.id, [note_id]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not found")
+
+    await notify_change(db, current_user.id, "delete", [note_id])
     await db.commit()
-    await db.refresh(db_note)
+    await response_cache.invalidate_user(current_user.id)
 
-    return db_note
 
 @router.post("/notes/{note_id}/add_tag", response_model=schemas.Note)
 async def add_tag_to_note(note_id: int, tag_name: str,
+                          include_content: bool = True,
                           db: AsyncSession = Depends(get_db),
-                          current_user: models.User = Depends(get_current_user)):
-    result = await db.execute(select(models.Note).filter(
-        models.Note.id == note_id,
-        models.Note.user_id == current_user.id
-    ).options(selectinload(models.Note.tags)))
-    db_note = result.scalar()
-
-    if not db_note:
+                          current_user: user_schemas.User = Depends(get_current_user)):
+    query = queries.NOTE_ROW_BY_OWNER if include_content else queries.NOTE_HEADER_BY_OWNER
+    result = await db.execute(query, {"note_id": note_id, "user_id": current_user.id})
+    row = result.first()
+
+    if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not found")
 
-    tag_result = await db.execute(select(models.Tag).filter(models.Tag.name == tag_name))
-    tag = tag_result.scalar()
-    if tag:
-        if tag not in db_note.tags:
-            db_note.tags.append(tag)
-        else:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tag already added to the note")
-    else:
-        new_tag = models.Tag(name=tag_name)
-        db.add(new_tag)
-        db_note.tags.append(new_tag)
+    note = dict(row._mapping)
+    if any(tag["name"] == tag_name for tag in note["tags"]):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tag already added to the note")
+
+    await change_seq(db, current_user.id)
+    tag, = await resolve_tags(db, [tag_name])
+    await link_tags(db, current_user.id, [(note_id, tag.id)])
+    note["tags"] = [*note["tags"], {"id": tag.id, "name": tag.name}]
+    await notify_change(db, current_user.id, "tags", [note_id])
 
     await db.commit()
-    await db.refresh(db_note)
+    await response_cache.invalidate_user(current_user.id)
 
-    return db_note
+    return ORJSONResponse(note)
 
 
 
 @router.delete("/notes/{note_id}/remove_tag", response_model=schemas.Note)
 async def remove_tag_from_note(note_id: int, tag_name: str,
+                               include_content: bool = True,
                                db: AsyncSession = Depends(get_db),
-                               current_user: models.User = Depends(get_current_user)):
-    result = await db.execute(select(models.Note).filter(
-        models.Note.id == note_id,
-        models.Note.user_id == current_user.id
-    ).options(selectinload(models.Note.tags)))
-    db_note = result.scalar()
-
-    if not db_note:
+                               current_user: user_schemas.User = Depends(get_current_user)):
+    query = queries.NOTE_ROW_BY_OWNER if include_content else queries.NOTE_HEADER_BY_OWNER
+    result = await db.execute(query, {"note_id": note_id, "user_id": current_user.id})
+    row = result.first()
+
+    if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not found")
 
-    tag_result = await db.execute(select(models.Tag).filter(models.Tag.name == tag_name))
-    tag = tag_result.scalar()
-    if tag and tag in db_note.tags:
-        db_note.tags.remove(tag)
-    else:
+    note = dict(row._mapping)
+    tag = next((tag for tag in note["tags"] if tag["name"] == tag_name), None)
+    if tag is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tag not found on the note")
 
+    await change_seq(db, current_user.id)
+    await unlink_tags(db, current_user.id, [(note_id, tag["id"])])
+    note["tags"] = [other for other in note["tags"] if other["id"] != tag["id"]]
+    await notify_change(db, current_user.id, "tags", [note_id])
+
     await db.commit()
-    await db.refresh(db_note)
+    await response_cache.invalidate_user(current_user.id)
+
+    return ORJSONResponse(note)
+
+
+# Словарь тегов пользователя с числом заметок по каждому
+@router.get("/tags", response_model=List[schemas.TagCount])
+async def get_tags_with_counts(request: Request,
+                               db: AsyncSession = Depends(get_read_db),
+                               current_user: user_schemas.User = Depends(get_current_user)):
+    async def produce() -> bytes:
+        result = await db.execute(queries.TAG_COUNTS_BY_USER, {"user_id": current_user.id})
+        return orjson.dumps([dict(row._mapping) for row in result.all()])
 
-    return db_note
+    return await cached_json(request, current_user.id, "tags", {}, produce)
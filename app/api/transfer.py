@@ -0,0 +1,155 @@
+import time
+import zlib
+from contextlib import asynccontextmanager
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db import queries
+from app.db.imports import NoteImporter
+from app.db.sync import notify_change
+from app.schemas import note as schemas
+from app.schemas import user as user_schemas
+from app.db.session import get_db, engine, ReadSessionLocal
+from app.api.auth import get_current_user
+from app.core.changes import NOTIFY_CHANNEL
+from app.core.response_cache import response_cache
+from config import settings
+
+router = APIRouter()
+
+# Сколько распакованных байт выдавать за раз: сжатый поток не раздувается в памяти целиком
+DECOMPRESS_CHUNK = 1 << 20
+
+
+async def _export_chunks(user_id: int):
+    # Серверный курсор и буфер фиксированного размера: память не зависит от числа заметок
+    query = queries.notes_by_owner(tuple(queries.NOTE_COLUMNS), False, False, False)
+    async with ReadSessionLocal() as db:
+        result = await db.stream(query, {"user_id": user_id},
+                                 execution_options={"yield_per": settings.NOTES_STREAM_BATCH_SIZE})
+        buffer = bytearray()
+        async for row in result:
+            buffer += orjson.dumps(dict(row._mapping))
+            buffer += b"\n"
+            if len(buffer) >= settings.NOTES_EXPORT_CHUNK_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+
+
+async def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@router.get("/export")
+async def export_notes(gzip: bool = False,
+                       current_user: user_schemas.User = Depends(get_current_user)):
+    body = _export_chunks(current_user.id)
+    if gzip:
+        return StreamingResponse(_gzipped(body), media_type="application/gzip",
+                                 headers={"Content-Disposition": 'attachment; filename="notes.ndjson.gz"'})
+    return StreamingResponse(body, media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="notes.ndjson"'})
+
+
+async def _decoded(chunks, gzip: bool):
+    if not gzip:
+        async for chunk in chunks:
+            yield chunk
+        return
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        async for chunk in chunks:
+            while chunk:
+                yield decompressor.decompress(chunk, DECOMPRESS_CHUNK)
+                chunk = decompressor.unconsumed_tail
+        yield decompressor.flush()
+    except zlib.error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid gzip body")
+
+
+async def _lines(chunks):
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+        if len(buffer) > settings.NOTES_IMPORT_MAX_LINE_BYTES:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                detail=f"Line is longer than {settings.NOTES_IMPORT_MAX_LINE_BYTES} bytes")
+    if buffer:
+        yield buffer
+
+
+@asynccontextmanager
+async def _progress(user_id: int):
+    """Отчет о ходе импорта в /notes/stream.
+
+    Транзакция импорта еще не зафиксирована, поэтому NOTIFY идет через отдельное
+    соединение в режиме autocommit.
+    """
+    if not settings.NOTES_NOTIFY_ENABLED:
+        async def report(imported: int) -> None:
+            pass
+        yield report
+        return
+
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+        async def report(imported: int) -> None:
+            payload = {"user_id": user_id, "event": "import_progress", "imported": imported}
+            await conn.execute(select(func.pg_notify(NOTIFY_CHANNEL, orjson.dumps(payload).decode())))
+
+        yield report
+
+
+# Импорт NDJSON в формате /notes/export; тело читается потоком, при Content-Encoding: gzip распаковывается
+@router.post("/import", response_model=schemas.NoteImportResult)
+async def import_notes(request: Request,
+                       db: AsyncSession = Depends(get_db),
+                       current_user: user_schemas.User = Depends(get_current_user)):
+    started = time.perf_counter()
+    gzip = request.headers.get("content-encoding", "").lower() == "gzip"
+
+    # Весь импорт - одна транзакция: при ошибке в любой строке не остается половины заметок
+    importer = NoteImporter(db, current_user.id, settings.NOTES_IMPORT_CHUNK_SIZE)
+    await importer.start()
+
+    async with _progress(current_user.id) as report:
+        line_number = 0
+        async for line in _lines(_decoded(request.stream(), gzip)):
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                note = schemas.NoteImport.model_validate_json(line)
+            except ValidationError as exc:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail=f"Line {line_number}: {exc.errors()[0]['msg']}")
+            if await importer.add(note):
+                await report(importer.imported)
+        await importer.flush()
+
+    if importer.imported:
+        await notify_change(db, current_user.id, "import", [])
+    await db.commit()
+    if importer.imported:
+        await response_cache.invalidate_user(current_user.id)
+
+    return schemas.NoteImportResult(notes=importer.imported, tag_links=importer.tag_links,
+                                    seconds=round(time.perf_counter() - started, 3))
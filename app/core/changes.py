@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Optional, Set
+
+import asyncpg
+import orjson
+from sqlalchemy.engine import make_url
+
+from app.core.metrics import STREAM_DROPPED, STREAM_SUBSCRIBERS
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "note_changes"
+# Новые регистрации: воркеры сразу добавляют telegram_id в свой фильтр Блума
+USERS_CHANNEL = "user_registrations"
+
+# Событие для подписчиков, которые могли пропустить изменения: пусть догонят через /notes/sync
+RESYNC = {"event": "resync"}
+
+
+class Subscriber:
+    """Очередь событий одного клиента /notes/stream с ограниченным буфером."""
+
+    __slots__ = ("user_id", "queue", "dropped")
+
+    def __init__(self, user_id: int, buffer: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer)
+        self.dropped = asyncio.Event()
+
+    def offer(self, event: dict) -> bool:
+        # Медленный клиент не задерживает остальных: при полном буфере он отключается
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.dropped.set()
+            return False
+
+
+class ChangeHub:
+    """Одно соединение LISTEN на воркер и раздача уведомлений подписчикам в памяти процесса."""
+
+    def __init__(self, max_subscribers: int, buffer: int, reconnect_delay: float = 1.0):
+        self.max_subscribers = max_subscribers
+        self.buffer = buffer
+        self.reconnect_delay = reconnect_delay
+        self.subscribers: Dict[int, Set[Subscriber]] = defaultdict(set)
+        self.count = 0
+        # Время (monotonic), с которого соединение LISTEN слушает все каналы; None - не слушает
+        self.connected_at: Optional[float] = None
+        self._channels: Dict[str, Callable] = {NOTIFY_CHANNEL: self._on_notify}
+        self._listener: Optional[asyncio.Task] = None
+
+    def listen(self, channel: str, callback: Callable) -> None:
+        """Дополнительный канал; регистрируется до start()."""
+        self._channels[channel] = callback
+
+    def subscribe(self, user_id: int) -> Optional[Subscriber]:
+        if self.count >= self.max_subscribers:
+            return None
+        subscriber = Subscriber(user_id, self.buffer)
+        self.subscribers[user_id].add(subscriber)
+        self.count += 1
+        STREAM_SUBSCRIBERS.inc()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscribers = self.subscribers.get(subscriber.user_id)
+        if subscribers is None or subscriber not in subscribers:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self.subscribers[subscriber.user_id]
+        self.count -= 1
+        STREAM_SUBSCRIBERS.dec()
+
+    def publish(self, user_id: int, event: dict) -> None:
+        for subscriber in list(self.subscribers.get(user_id, ())):
+            if not subscriber.offer(event):
+                STREAM_DROPPED.inc()
+                self.unsubscribe(subscriber)
+
+    def broadcast(self, event: dict) -> None:
+        for user_id in list(self.subscribers):
+            self.publish(user_id, event)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            event = orjson.loads(payload)
+            user_id = event.pop("user_id")
+        except (orjson.JSONDecodeError, KeyError, TypeError):
+            logger.warning("Malformed change notification: %r", payload)
+            return
+        self.publish(user_id, event)
+
+    def start(self, database_url: str) -> None:
+        if self._listener is None:
+            # asyncpg принимает DSN без суффикса драйвера SQLAlchemy
+            dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+            self._listener = asyncio.create_task(self._listen(dsn))
+
+    async def _listen(self, dsn: str) -> None:
+        connected_before = False
+        while True:
+            try:
+                connection = await asyncpg.connect(dsn)
+            except (OSError, asyncpg.PostgresError):
+                logger.warning("LISTEN connection failed, retrying", exc_info=True)
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            try:
+                for channel, callback in self._channels.items():
+                    await connection.add_listener(channel, callback)
+                self.connected_at = time.monotonic()
+                if connected_before:
+                    # Уведомления за время разрыва потеряны
+                    self.broadcast(RESYNC)
+                connected_before = True
+                await closed.wait()
+            finally:
+                self.connected_at = None
+                await connection.close()
+            logger.warning("LISTEN connection lost, reconnecting")
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        # Открытые потоки завершаются, клиенты переподключатся к другому воркеру
+        for user_id in list(self.subscribers):
+            for subscriber in list(self.subscribers[user_id]):
+                subscriber.dropped.set()
+                self.unsubscribe(subscriber)
+
+
+change_hub = ChangeHub(max_subscribers=settings.NOTES_STREAM_MAX_SUBSCRIBERS, buffer=settings.NOTES_STREAM_BUFFER)
@@ -0,0 +1,136 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+# Отчеты о старте воркера идут в журнал uvicorn/gunicorn
+startup_logger = logging.getLogger("uvicorn.error")
+
+# Границы в секундах: от долей миллисекунды (кэш, Redis) до секунд (bcrypt, тяжелые выборки)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Время обработки запроса",
+                            ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+REQUEST_SQL_STATEMENTS = Histogram("http_request_sql_statements", "Число SQL-запросов на HTTP-запрос",
+                                   ["method", "route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100))
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Суммарное время SQL-запросов на HTTP-запрос",
+                               ["method", "route"], buckets=LATENCY_BUCKETS)
+SQL_ERRORS = Counter("db_statement_errors_total", "SQL-запросы, завершившиеся ошибкой", ["engine"])
+POOL_WAIT = Histogram("db_pool_wait_seconds", "Ожидание соединения из пула", ["engine"], buckets=LATENCY_BUCKETS)
+RATE_LIMIT_LATENCY = Histogram("rate_limit_check_seconds", "Время проверки лимита запросов",
+                               ["backend"], buckets=LATENCY_BUCKETS)
+USER_CHECKS = Counter("user_check_total", "Ответы проверки существования пользователя по источнику",
+                      ["source"])
+# livesum: в режиме нескольких процессов складываются значения только живых воркеров
+STREAM_SUBSCRIBERS = Gauge("notes_stream_subscribers", "Открытые подписки /notes/stream",
+                           multiprocess_mode="livesum")
+STREAM_DROPPED = Counter("notes_stream_dropped_total", "Подписчики, отключенные из-за переполненного буфера")
+# coalesced / (leader + coalesced) - доля чтений, которые не выполняли запросы сами
+SINGLE_FLIGHT = Counter("single_flight_requests_total", "Чтения через single-flight по роли",
+                        ["route", "role"])
+PASSWORD_HASH_SECONDS = Histogram("password_hash_seconds", "Время работы bcrypt в пуле потоков",
+                                  ["operation"], buckets=LATENCY_BUCKETS)
+
+
+class RequestStats:
+    """SQL, выполненный в рамках одного HTTP-запроса."""
+
+    __slots__ = ("statements", "db_seconds", "queries")
+
+    def __init__(self, keep_queries: bool):
+        self.statements = 0
+        self.db_seconds = 0.0
+        # Текст запросов собираем только для журнала медленных запросов
+        self.queries: Optional[List[str]] = [] if keep_queries else None
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def install_query_metrics(db_engine, name: str) -> None:
+    """Считает число и время SQL-запросов текущего HTTP-запроса."""
+    sync_engine = db_engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        stats = request_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+            if stats.queries is not None:
+                stats.queries.append(f"{elapsed * 1000:.1f}ms {statement}")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+        if started:
+            started.pop()
+        SQL_ERRORS.labels(name).inc()
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: гистограммы задержек по шаблону маршрута и журнал медленных запросов."""
+
+    def __init__(self, app, slow_request_ms: int = 0):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+        self.first_request = True
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(keep_queries=self.slow_request_ms > 0)
+        token = request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_stats.reset(token)
+            # Шаблон маршрута, а не путь: иначе id заметок раздуют число серий
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_LATENCY.labels(scope["method"], route, status_code).observe(elapsed)
+            REQUEST_SQL_STATEMENTS.labels(scope["method"], route).observe(stats.statements)
+            REQUEST_DB_SECONDS.labels(scope["method"], route).observe(stats.db_seconds)
+
+            if self.first_request:
+                # Первый запрос воркера показывает, сколько еще стоит холодный старт
+                self.first_request = False
+                startup_logger.info("First request %s %s: %.1fms, %d SQL statements",
+                                    scope["method"], route, elapsed * 1000, stats.statements)
+
+            if self.slow_request_ms and elapsed * 1000 >= self.slow_request_ms:
+                logger.warning("Slow request %s %s -> %s: %.1fms, %d SQL statements in %.1fms\n%s",
+                               scope["method"], route, status_code, elapsed * 1000,
+                               stats.statements, stats.db_seconds * 1000, "\n".join(stats.queries))
+
+
+def metrics_response() -> Response:
+    # С несколькими воркерами gunicorn метрики собираются из файлов всех процессов
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,34 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(updated_at: datetime, note_id: int) -> str:
+    raw = json.dumps([updated_at.isoformat(), note_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Разбирает непрозрачный курсор страницы, при ошибке бросает ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, note_id = json.loads(raw)
+        return datetime.fromisoformat(updated_at), int(note_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def encode_sync_cursor(change_seq: int, note_id: int) -> str:
+    raw = json.dumps([change_seq, note_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_sync_cursor(cursor: str) -> Tuple[int, int]:
+    """Разбирает курсор синхронизации, при ошибке бросает ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        change_seq, note_id = json.loads(raw)
+        return int(change_seq), int(note_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
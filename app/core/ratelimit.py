@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, NamedTuple, Optional
+
+from fastapi import HTTPException, Request, status
+from jose import JWTError
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.cache import TTLCache
+from app.core.metrics import RATE_LIMIT_LATENCY
+from app.core.security import decode_access_token
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Limit(NamedTuple):
+    times: int
+    seconds: int
+
+
+def check_limit(name: str, limit: Limit) -> Limit:
+    # Включенному лимиту нужно окно: из него считается скорость пополнения бакета
+    if limit.times > 0 and limit.seconds <= 0:
+        raise ValueError(f"Rate limit {name}: window must be a positive number of seconds, got {limit.seconds}")
+    return limit
+
+
+def parse_limits(value: str) -> Dict[str, Limit]:
+    """Разбирает лимиты маршрутов вида ``check_user=600/60,login=10/60``; ``route=0`` отключает лимит."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, _, rule = (part.strip() for part in item.partition("="))
+        times, slash, seconds = rule.partition("/")
+        try:
+            limit = Limit(int(times), int(seconds) if slash else 0)
+        except ValueError:
+            raise ValueError(f"Rate limit {route}: expected times/seconds or 0, got {rule!r}") from None
+        if not route:
+            raise ValueError(f"Rate limit {item!r}: route name is missing")
+        limits[route] = check_limit(route, limit)
+    return limits
+
+
+# Окно фиксированной длины, которое увеличивается сразу на стоимость запроса.
+# Возвращает оставшееся время окна в миллисекундах, если лимит превышен, иначе 0
+CHARGE_SCRIPT = """
+local current = redis.call('INCRBY', KEYS[1], ARGV[1])
+if current == tonumber(ARGV[1]) then
+    redis.call('PEXPIRE', KEYS[1], ARGV[3])
+end
+if current > tonumber(ARGV[2]) then
+    return redis.call('PTTL', KEYS[1])
+end
+return 0
+"""
+
+# Пакетная версия для гибридного режима: ARGV - тройки (стоимость, лимит, окно) по каждому ключу.
+# Возвращает оставшееся время окна для превысивших лимит ключей и 0 для остальных
+RECONCILE_SCRIPT = """
+local result = {}
+for i, key in ipairs(KEYS) do
+    local cost = tonumber(ARGV[i * 3 - 2])
+    local current = redis.call('INCRBY', key, cost)
+    if current == cost then
+        redis.call('PEXPIRE', key, ARGV[i * 3])
+    end
+    if current > tonumber(ARGV[i * 3 - 1]) then
+        result[i] = redis.call('PTTL', key)
+    else
+        result[i] = 0
+    end
+end
+return result
+"""
+
+
+class LocalBackend:
+    """Token bucket в памяти процесса: без сетевых вызовов, лимит действует на один воркер."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    async def hit(self, key: str, cost: int, limit: Limit) -> float:
+        now = time.monotonic()
+        rate = limit.times / limit.seconds
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(limit.times), now]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(limit.times, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0
+        return (cost - bucket[0]) / rate
+
+    def init(self, redis: Redis) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBackend:
+    """Точный общий лимит: один вызов Lua-скрипта в Redis на каждый запрос."""
+
+    def __init__(self):
+        self._charge = None
+
+    def init(self, redis: Redis) -> None:
+        # EVALSHA по хэшу скрипта; после SCRIPT FLUSH или рестарта Redis клиент загрузит его заново
+        self._charge = redis.register_script(CHARGE_SCRIPT)
+
+    async def hit(self, key: str, cost: int, limit: Limit) -> float:
+        pexpire = await self._charge(keys=[key], args=[cost, limit.times, limit.seconds * 1000])
+        return pexpire / 1000
+
+    async def close(self) -> None:
+        pass
+
+
+class HybridBackend:
+    """Локальные бакеты с фоновой пакетной сверкой счетчиков через Redis.
+
+    Запрос решается локально, а накопленные списания раз в ``flush_interval``
+    отправляются одним вызовом скрипта. Ключи, превысившие общий лимит,
+    блокируются локально до конца окна Redis.
+    """
+
+    def __init__(self, max_keys: int, flush_interval: float):
+        self.local = LocalBackend(max_keys)
+        self.flush_interval = flush_interval
+        self._reconcile = None
+        self._pending: Dict[str, list] = defaultdict(lambda: [0, None])
+        # Блокировка живет до конца окна Redis и вытесняется, как и локальные бакеты
+        self._blocked = TTLCache(maxsize=max_keys, ttl=math.inf)
+        self._flusher: Optional[asyncio.Task] = None
+
+    def init(self, redis: Redis) -> None:
+        self._reconcile = redis.register_script(RECONCILE_SCRIPT)
+
+    async def hit(self, key: str, cost: int, limit: Limit) -> float:
+        now = time.monotonic()
+        blocked_until = self._blocked.get(key)
+        if blocked_until is not None and blocked_until > now:
+            return blocked_until - now
+
+        retry_after = await self.local.hit(key, cost, limit)
+        if retry_after:
+            return retry_after
+
+        pending = self._pending[key]
+        pending[0] += cost
+        pending[1] = limit
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+        return 0
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._pending or self._reconcile is None:
+            return
+        pending, self._pending = self._pending, defaultdict(lambda: [0, None])
+
+        keys = list(pending)
+        args = []
+        for key in keys:
+            cost, limit = pending[key]
+            args += [cost, limit.times, limit.seconds * 1000]
+        try:
+            result = await self._reconcile(keys=keys, args=args)
+        except RedisError:
+            # Без Redis продолжаем работать только на локальных бакетах
+            logger.warning("Rate limit reconciliation failed", exc_info=True)
+            return
+
+        now = time.monotonic()
+        for key, pexpire in zip(keys, result):
+            if pexpire:
+                self._blocked.set(key, now + pexpire / 1000, ttl=pexpire / 1000)
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+
+class RateLimiter:
+    """Лимиты по маршрутам с ключом по аутентифицированному пользователю, а не по IP."""
+
+    def __init__(self, backend, default: Limit, limits: Dict[str, Limit]):
+        self.backend = backend
+        self.default = default
+        self.limits = limits
+
+    def init(self, redis: Redis) -> None:
+        self.backend.init(redis)
+
+    @staticmethod
+    def identify(request: Request) -> str:
+        # Расшифровка токена кэшируется, поэтому для горячих токенов подпись повторно не проверяется
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                sub = decode_access_token(token).get("sub")
+                if sub is not None:
+                    return f"user:{sub}"
+            except JWTError:
+                pass
+        return f"ip:{request.client.host if request.client else 'unknown'}"
+
+    async def check(self, request: Request, cost: int = 1) -> None:
+        route = request.scope.get("route")
+        route_name = getattr(route, "name", None) or request.url.path
+        limit = self.limits.get(route_name, self.default)
+        # Лимит 0 отключает проверку для маршрута
+        if limit.times <= 0 or cost <= 0:
+            return
+
+        key = f"ratelimit:{route_name}:{self.identify(request)}"
+        started = time.perf_counter()
+        retry_after = await self.backend.hit(key, cost, limit)
+        RATE_LIMIT_LATENCY.labels(type(self.backend).__name__).observe(time.perf_counter() - started)
+        if retry_after:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too Many Requests",
+                                headers={"Retry-After": str(math.ceil(retry_after))})
+
+
+def create_backend(kind: str):
+    if kind == "local":
+        return LocalBackend(settings.RATE_LIMIT_LOCAL_MAX_KEYS)
+    if kind == "hybrid":
+        return HybridBackend(settings.RATE_LIMIT_LOCAL_MAX_KEYS, settings.RATE_LIMIT_FLUSH_INTERVAL)
+    return RedisBackend()
+
+
+rate_limiter = RateLimiter(create_backend(settings.RATE_LIMIT_BACKEND),
+                           default=check_limit("default", Limit(settings.RATE_LIMIT_TIMES,
+                                                                settings.RATE_LIMIT_SECONDS)),
+                           limits=parse_limits(settings.RATE_LIMITS))
+
+
+async def rate_limit(request: Request) -> None:
+    await rate_limiter.check(request)
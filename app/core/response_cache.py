@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Request, Response, status
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.singleflight import single_flight
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Кэш готовых JSON-ответов в Redis с версионированием ключей по пользователю.
+
+    Любая запись пользователя увеличивает его версию, поэтому старые ключи
+    просто перестают читаться и истекают по TTL без SCAN и DEL.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.redis: Optional[Redis] = None
+
+    @staticmethod
+    def _version_key(user_id: int) -> str:
+        return f"notes:ver:{user_id}"
+
+    async def version(self, user_id: int) -> Optional[int]:
+        if self.redis is None:
+            return None
+        try:
+            version = await self.redis.get(self._version_key(user_id))
+            if version is None:
+                # Начинаем со времени, чтобы после вытеснения ключа версии не повторить старую
+                await self.redis.set(self._version_key(user_id), time.time_ns(), nx=True)
+                version = await self.redis.get(self._version_key(user_id))
+            return int(version)
+        except RedisError:
+            logger.warning("Response cache is unavailable", exc_info=True)
+            return None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            return await self.redis.get(key)
+        except RedisError:
+            logger.warning("Response cache is unavailable", exc_info=True)
+            return None
+
+    async def set(self, key: str, body: bytes) -> None:
+        try:
+            await self.redis.set(key, body, ex=self.ttl)
+        except RedisError:
+            logger.warning("Response cache is unavailable", exc_info=True)
+
+    async def invalidate_user(self, user_id: int) -> None:
+        # До первого await: запрос после записи не присоединится к чтению, начатому до нее
+        single_flight.invalidate_user(user_id)
+        if self.redis is None:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(self._version_key(user_id), time.time_ns(), nx=True)
+                pipe.incr(self._version_key(user_id))
+                await pipe.execute()
+        except RedisError:
+            logger.warning("Response cache invalidation failed", exc_info=True)
+
+
+response_cache = ResponseCache(ttl=settings.RESPONSE_CACHE_TTL_SECONDS)
+
+
+def _digest(*parts) -> str:
+    raw = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {value.strip().removeprefix("W/") for value in header.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+async def cached_json(request: Request, user_id: int, route: str, params: dict,
+                      produce: Callable[[], Awaitable[bytes]]) -> Response:
+    """Отдает ответ из кэша или вычисляет его через ``produce`` и сохраняет.
+
+    ETag зависит только от версии пользователя и параметров запроса,
+    поэтому 304 отдается без чтения тела из Redis и без обращения к базе.
+    Одинаковые параллельные запросы воркера вычисляют тело один раз.
+    """
+    version = await response_cache.version(user_id)
+
+    if version is not None:
+        etag = f'"{_digest(user_id, version, route, params)}"'
+        if etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        key = f"notes:{user_id}:{version}:{route}:{_digest(params)}"
+
+        async def load() -> bytes:
+            body = await response_cache.get(key)
+            if body is None:
+                body = await produce()
+                await response_cache.set(key, body)
+            return body
+
+        body = await single_flight.do(user_id, route, key, load)
+    else:
+        # Без Redis ETag считается по телу и экономит только трафик
+        body = await single_flight.do(user_id, route, _digest(params), produce)
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        if etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
@@ -1,10 +1,25 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
-from jose import JWTError, jwt
+from jose import jwt
 from datetime import datetime, timedelta
 
+from app.core.cache import TTLCache
+from app.core.metrics import PASSWORD_HASH_SECONDS
 from config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# bcrypt отпускает GIL, поэтому хэширование выносим в отдельный ограниченный пул потоков
+hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_pending = 0
+
+# Уже проверенные токены: горячие токены не проходят проверку подписи повторно
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -12,9 +27,48 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def _timed(operation, func, *args):
+    # Замеряем саму работу bcrypt в потоке, без ожидания в очереди пула
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        PASSWORD_HASH_SECONDS.labels(operation).observe(time.perf_counter() - started)
+
+async def _run_hasher(operation, func, *args):
+    global _hash_pending
+    # При переполнении очереди отказываем сразу, а не копим ожидающие запросы
+    if _hash_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Password hashing is overloaded, try again later",
+                            headers={"Retry-After": "1"})
+    _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(hash_executor, _timed, operation, func, *args)
+    finally:
+        _hash_pending -= 1
+
+async def verify_password_async(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    # Возвращает новый хэш, если сохраненный устарел (например, изменился BCRYPT_ROUNDS)
+    return await _run_hasher("verify", pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    return await _run_hasher("hash", pwd_context.hash, password)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+def token_ttl(payload: dict) -> float:
+    # Сколько секунд токен еще действителен
+    return payload.get("exp", 0) - time.time()
+
+def decode_access_token(token: str) -> dict:
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        token_cache.set(token, payload, ttl=token_ttl(payload))
+    return payload
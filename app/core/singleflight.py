@@ -0,0 +1,59 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+from app.core.metrics import SINGLE_FLIGHT
+
+
+class SingleFlight:
+    """Одинаковые параллельные чтения внутри воркера ждут одно вычисление.
+
+    Ключ - пользователь, маршрут и нормализованные параметры. Запрос, пришедший
+    во время вычисления, получает те же байты (или то же исключение). Запись
+    пользователя отвязывает текущие вычисления: новые запросы после нее
+    начинают свое, а не присоединяются к начатому до записи.
+    """
+
+    def __init__(self):
+        self._calls: Dict[int, Dict[Hashable, asyncio.Future]] = {}
+
+    async def do(self, user_id: int, route: str, key: Hashable,
+                 produce: Callable[[], Awaitable[bytes]]) -> bytes:
+        calls = self._calls.setdefault(user_id, {})
+        future = calls.get((route, key))
+        if future is not None:
+            SINGLE_FLIGHT.labels(route, "coalesced").inc()
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Отменили ведущий запрос (клиент ушел), а не этот: считаем сами
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        SINGLE_FLIGHT.labels(route, "leader").inc()
+        future = asyncio.get_running_loop().create_future()
+        # Исключение, которого никто не дождался, не должно попадать в журнал asyncio
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        calls[(route, key)] = future
+        try:
+            body = await produce()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(body)
+            return body
+        finally:
+            calls = self._calls.get(user_id)
+            if calls is not None and calls.get((route, key)) is future:
+                del calls[(route, key)]
+                if not calls:
+                    del self._calls[user_id]
+
+    def invalidate_user(self, user_id: int) -> None:
+        self._calls.pop(user_id, None)
+
+
+single_flight = SingleFlight()
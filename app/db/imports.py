@@ -0,0 +1,102 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.sync import change_seq
+from app.schemas import note as schemas
+
+NOTE_COLUMNS = ("id", "title", "content", "created_at", "updated_at", "user_id", "change_seq")
+
+# Имена тегов пакета до разрешения в id; удаляется вместе с транзакцией импорта
+CREATE_STAGING = text("CREATE TEMP TABLE import_note_tags (note_id integer, name text) ON COMMIT DROP")
+
+RESERVE_IDS = text("SELECT nextval(pg_get_serial_sequence('notes', 'id')) FROM generate_series(1, :count)")
+
+MERGE_TAGS = text(
+    "INSERT INTO tags (name) SELECT DISTINCT name FROM import_note_tags "
+    "ON CONFLICT (name) DO NOTHING"
+)
+
+# Связи и счетчики словаря тегов одним запросом
+MERGE_NOTE_TAGS = text(
+    "WITH linked AS ("
+    " INSERT INTO note_tag (note_id, tag_id)"
+    " SELECT DISTINCT s.note_id, t.id FROM import_note_tags s JOIN tags t ON t.name = s.name"
+    " ON CONFLICT DO NOTHING RETURNING tag_id"
+    ") "
+    "INSERT INTO user_tag_counts (user_id, tag_id, count) "
+    "SELECT :user_id, tag_id, count(*) FROM linked GROUP BY tag_id "
+    "ON CONFLICT (user_id, tag_id) DO UPDATE SET count = user_tag_counts.count + excluded.count"
+)
+
+TRUNCATE_STAGING = text("TRUNCATE import_note_tags")
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Колонки без часового пояса хранят UTC, как и utc_now() в моделях
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class NoteImporter:
+    """Загрузка заметок пакетами через COPY в одной транзакции.
+
+    id заметок выдаются заранее из последовательности, поэтому заметки копируются
+    сразу в ``notes``, а имена тегов - во временную таблицу, откуда теги, связи
+    и счетчики сливаются запросами над множествами.
+    """
+
+    def __init__(self, db: AsyncSession, user_id: int, chunk_size: int):
+        self.db = db
+        self.user_id = user_id
+        self.chunk_size = chunk_size
+        self.imported = 0
+        self.tag_links = 0
+        self._pending: List[schemas.NoteImport] = []
+        self._seq = 0
+        self._raw = None
+
+    async def start(self) -> None:
+        # Первый запрос открывает транзакцию, в которой потом идет COPY на том же соединении
+        await self.db.execute(CREATE_STAGING)
+        self._seq = await change_seq(self.db, self.user_id)
+        connection = await self.db.connection()
+        self._raw = (await connection.get_raw_connection()).driver_connection
+
+    async def add(self, note: schemas.NoteImport) -> bool:
+        """Добавляет заметку и возвращает True, если пакет был записан."""
+        self._pending.append(note)
+        if len(self._pending) >= self.chunk_size:
+            await self.flush()
+            return True
+        return False
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+
+        result = await self.db.execute(RESERVE_IDS, {"count": len(pending)})
+        ids = result.scalars().all()
+
+        now = datetime.utcnow()
+        notes: List[tuple] = []
+        tags: List[Tuple[int, str]] = []
+        for note_id, note in zip(ids, pending):
+            created_at = _naive_utc(note.created_at) or now
+            notes.append((note_id, note.title, note.content, created_at, _naive_utc(note.updated_at) or created_at,
+                          self.user_id, self._seq))
+            tags.extend((note_id, name) for name in dict.fromkeys(note.tags))
+
+        await self._raw.copy_records_to_table("notes", records=notes, columns=NOTE_COLUMNS)
+        if tags:
+            await self._raw.copy_records_to_table("import_note_tags", records=tags, columns=("note_id", "name"))
+            await self.db.execute(MERGE_TAGS)
+            await self.db.execute(MERGE_NOTE_TAGS, {"user_id": self.user_id})
+            await self.db.execute(TRUNCATE_STAGING)
+
+        self.imported += len(pending)
+        self.tag_links += len(tags)
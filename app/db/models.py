@@ -1,52 +1,116 @@
-from datetime import datetime
-
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import func, BigInteger, Column, Integer, String, Text, DateTime, ForeignKey, Table, Computed, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.ext.declarative import declarative_base
 
 
 Base = declarative_base()
 
+
+def utc_now():
+    # Наивное время в UTC, как раньше давал datetime.utcnow
+    return func.timezone('utc', func.now())
+
+
+# Конфигурация полнотекстового поиска: без стемминга, подходит для любого языка
+SEARCH_CONFIG = 'simple'
+# Индексируется только начало текста: tsvector ограничен 1 МБ, и на многомегабайтной
+# заметке to_tsvector падает, а вместе с ним и запись заметки
+SEARCH_MAX_CHARS = 100000
+
 note_tag_association = Table(
     'note_tag', Base.metadata,
-    Column('note_id', ForeignKey('notes.id'), primary_key=True),
-    Column('tag_id', ForeignKey('tags.id'), primary_key=True)
+    # Связи удаляются вместе с заметкой или тегом на стороне базы
+    Column('note_id', ForeignKey('notes.id', ondelete='CASCADE'), primary_key=True),
+    Column('tag_id', ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True),
+    # Первичный ключ (note_id, tag_id) не обслуживает поиск заметок по тегу
+    Index('ix_note_tag_tag_id_note_id', 'tag_id', 'note_id'),
 )
 
 
 class User(Base):
     __tablename__ = 'users'
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     telegram_id = Column(String, unique=True, index=True, nullable=False)  # Изменили тип на String
     hashed_password = Column(String, nullable=False)
+    # Последний выданный номер изменения заметок пользователя для /notes/sync
+    change_seq = Column(BigInteger, nullable=False, server_default='0')
+    # Надгробия с номером не больше этого уже удалены: более старым курсорам нужна полная загрузка
+    sync_horizon = Column(BigInteger, nullable=False, server_default='0')
     notes = relationship("Note", back_populates="user")
 
 
 class Note(Base):
     __tablename__ = 'notes'
 
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True)
-    content = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    id = Column(Integer, primary_key=True)
+    title = Column(String)
+    # Текст читается только там, где он нужен; длинные значения сжаты в TOAST (lz4)
+    content = deferred(Column(Text))
+    # Размер в байтах и md5 текста считает база: списки отдают их вместо самого текста
+    content_length = Column(Integer, Computed("octet_length(content)", persisted=True))
+    content_hash = Column(String(32), Computed("md5(content)", persisted=True))
+    # Время ставит сама база, поэтому оно приходит через RETURNING без отдельного SELECT
+    created_at = Column(DateTime, server_default=utc_now())
+    updated_at = Column(DateTime, server_default=utc_now(), onupdate=utc_now())
+
+    # Генерируемый вектор для полнотекстового поиска, заголовок весит больше текста
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', left(coalesce(title, ''), {SEARCH_MAX_CHARS})), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', left(coalesce(content, ''), {SEARCH_MAX_CHARS})), 'B')",
+        persisted=True,
+    )))
 
     # Внешний ключ на пользователя
     user_id = Column(Integer, ForeignKey('users.id'))
 
+    # Номер последнего изменения заметки или ее тегов в последовательности пользователя
+    change_seq = Column(BigInteger, nullable=False, server_default='0')
+
     # Связь с моделью User
     user = relationship("User", back_populates="notes")
 
     # Связь с тегами через ассоциативную таблицу
     tags = relationship('Tag', secondary=note_tag_association, back_populates='notes')
 
+    __table_args__ = (
+        Index('ix_notes_search_vector', 'search_vector', postgresql_using='gin'),
+        # Все чтения ограничены владельцем; порядок совпадает с сортировкой и курсором списка
+        Index('ix_notes_user_id_updated_at_id', user_id, updated_at.desc(), id.desc()),
+        Index('ix_notes_user_id_change_seq_id', user_id, change_seq, id),
+    )
+
 
 class Tag(Base):
     __tablename__ = 'tags'
 
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, index=True)
 
     # Связь с заметками через ассоциативную таблицу
     notes = relationship('Note', secondary=note_tag_association, back_populates='tags')
+
+
+# Сколько заметок пользователя помечено тегом; поддерживается путями записи
+class UserTagCount(Base):
+    __tablename__ = 'user_tag_counts'
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    tag_id = Column(Integer, ForeignKey('tags.id'), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+# Удаленные заметки для инкрементальной синхронизации; старые удаляются по сроку хранения
+class NoteTombstone(Base):
+    __tablename__ = 'note_tombstones'
+
+    note_id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    change_seq = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime, nullable=False, server_default=utc_now())
+
+    __table_args__ = (
+        Index('ix_note_tombstones_user_id_change_seq_note_id', user_id, change_seq, note_id),
+        Index('ix_note_tombstones_deleted_at', deleted_at),
+    )
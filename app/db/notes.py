@@ -0,0 +1,38 @@
+from typing import List
+
+from sqlalchemy import Integer, bindparam, delete, any_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db import models
+from app.db.sync import change_seq, record_deletes
+from app.db.tags import adjust_tag_counts
+
+
+async def delete_notes(db: AsyncSession, user_id: int, ids: List[int]) -> List[int]:
+    """Удаляет заметки пользователя по списку id и возвращает id удаленных."""
+    if not ids:
+        return []
+
+    # Строка пользователя блокируется раньше note_tag и счетчиков, как при создании заметки
+    await change_seq(db, user_id)
+
+    # Один параметр-массив вместо IN с переменным числом параметров
+    note_ids = bindparam("note_ids", list(ids), type_=ARRAY(Integer))
+    owned = select(models.Note.id).where(models.Note.id == any_(note_ids), models.Note.user_id == user_id)
+
+    note_tag = models.note_tag_association
+    result = await db.execute(delete(note_tag)
+                              .where(note_tag.c.note_id.in_(owned))
+                              .returning(note_tag.c.note_id, note_tag.c.tag_id))
+    await adjust_tag_counts(db, user_id, result.all(), -1)
+
+    result = await db.execute(delete(models.Note)
+                              .where(models.Note.id == any_(note_ids), models.Note.user_id == user_id)
+                              .returning(models.Note.id)
+                              .execution_options(synchronize_session=False))
+    deleted = result.scalars().all()
+    # Надгробия сообщают клиентам /notes/sync об удалении
+    await record_deletes(db, user_id, deleted)
+    return deleted
@@ -0,0 +1,177 @@
+from functools import lru_cache
+from typing import Tuple
+
+from sqlalchemy import BigInteger, DateTime, Integer, bindparam, event, exists, func, tuple_
+from sqlalchemy.engine import default
+from sqlalchemy.future import select
+
+from app.db import models
+from app.db.tags import note_tags_json
+
+# Запросы горячих путей собираются один раз, значения передаются через bindparam.
+# SQLAlchemy запоминает ключ кэша компиляции на объекте запроса, поэтому на каждый
+# вызов не тратятся ни сборка выражения, ни вычисление ключа.
+USER_BY_TELEGRAM_ID = select(models.User).where(models.User.telegram_id == bindparam("telegram_id"))
+
+# Проверка существования читает только индекс telegram_id, без hashed_password
+USER_EXISTS = select(exists().where(models.User.telegram_id == bindparam("telegram_id")))
+EXISTING_TELEGRAM_IDS = (select(models.User.telegram_id)
+                         .where(models.User.telegram_id.in_(bindparam("telegram_ids", expanding=True))))
+USERS_COUNT = select(func.count()).select_from(models.User)
+USERS_AFTER_ID = (select(models.User.id, models.User.telegram_id)
+                  .where(models.User.id > bindparam("after_id", type_=Integer))
+                  .order_by(models.User.id))
+
+# Колонки ответа схемы Note; теги приходят одним JSON-массивом в той же строке
+NOTE_COLUMNS = {
+    "id": models.Note.id,
+    "title": models.Note.title,
+    "content": models.Note.content,
+    "content_length": models.Note.content_length,
+    "content_hash": models.Note.content_hash,
+    "created_at": models.Note.created_at,
+    "updated_at": models.Note.updated_at,
+    "tags": note_tags_json(models.Note.id),
+}
+
+
+def note_columns(fields: Tuple[str, ...] = tuple(NOTE_COLUMNS)):
+    # id и updated_at нужны для курсора, даже если в ответ они не попадают
+    names = dict.fromkeys(("id", "updated_at", *fields))
+    return [NOTE_COLUMNS[name].label(name) for name in names]
+
+
+# Все поля, кроме текста: такие запросы не распаковывают TOAST
+NOTE_HEADER_FIELDS = tuple(name for name in NOTE_COLUMNS if name != "content")
+
+
+def _note_by_owner(fields: Tuple[str, ...]):
+    return (select(*note_columns(fields))
+            .where(models.Note.id == bindparam("note_id"), models.Note.user_id == bindparam("user_id")))
+
+
+NOTE_ROW_BY_OWNER = _note_by_owner(tuple(NOTE_COLUMNS))
+NOTE_HEADER_BY_OWNER = _note_by_owner(NOTE_HEADER_FIELDS)
+
+# Хэш проверяется до чтения текста: на совпавший If-None-Match тело не распаковывается
+NOTE_CONTENT_HASH_BY_OWNER = (select(models.Note.content_hash)
+                              .where(models.Note.id == bindparam("note_id"),
+                                     models.Note.user_id == bindparam("user_id")))
+NOTE_CONTENT_BY_OWNER = (select(models.Note.content)
+                         .where(models.Note.id == bindparam("note_id"), models.Note.user_id == bindparam("user_id")))
+
+
+TAG_COUNTS_BY_USER = (select(models.Tag.id, models.Tag.name, models.UserTagCount.count)
+                      .join(models.UserTagCount, models.UserTagCount.tag_id == models.Tag.id)
+                      .where(models.UserTagCount.user_id == bindparam("user_id"), models.UserTagCount.count > 0)
+                      .order_by(models.UserTagCount.count.desc(), models.Tag.name))
+
+
+def _changes_after(fields: Tuple[str, ...]):
+    return (select(*note_columns(fields), models.Note.change_seq.label("change_seq"))
+            .where(models.Note.user_id == bindparam("user_id"),
+                   tuple_(models.Note.change_seq, models.Note.id) >
+                   tuple_(bindparam("since_seq", type_=BigInteger), bindparam("since_id", type_=Integer)))
+            .order_by(models.Note.change_seq, models.Note.id)
+            .limit(bindparam("limit", type_=Integer)))
+
+
+# Инкрементальная синхронизация: изменения и удаления после курсора (since_seq, since_id);
+# без текста клиент докачивает только тела с изменившимся content_hash
+NOTE_CHANGES = _changes_after(tuple(NOTE_COLUMNS))
+NOTE_CHANGE_HEADERS = _changes_after(NOTE_HEADER_FIELDS)
+
+NOTE_DELETIONS = (select(models.NoteTombstone.note_id, models.NoteTombstone.change_seq)
+                  .where(models.NoteTombstone.user_id == bindparam("user_id"),
+                         tuple_(models.NoteTombstone.change_seq, models.NoteTombstone.note_id) >
+                         tuple_(bindparam("since_seq", type_=BigInteger), bindparam("since_id", type_=Integer)))
+                  .order_by(models.NoteTombstone.change_seq, models.NoteTombstone.note_id)
+                  .limit(bindparam("limit", type_=Integer)))
+
+SYNC_HORIZON = select(models.User.sync_horizon).where(models.User.id == bindparam("user_id"))
+
+
+@lru_cache(maxsize=256)
+def notes_by_owner(fields: Tuple[str, ...], with_tag: bool, with_cursor: bool, limited: bool):
+    """Строки списка заметок пользователя; форма запроса зависит только от аргументов.
+
+    Параметры: ``user_id``, а также ``tag``, ``cursor_updated_at``/``cursor_id``
+    и ``limit``, если соответствующая часть запроса включена.
+    """
+    stmt = (select(*note_columns(fields))
+            .where(models.Note.user_id == bindparam("user_id"))
+            .order_by(models.Note.updated_at.desc(), models.Note.id.desc()))
+
+    if with_tag:
+        stmt = stmt.where(models.Note.tags.any(models.Tag.name == bindparam("tag")))
+    if with_cursor:
+        stmt = stmt.where(tuple_(models.Note.updated_at, models.Note.id) <
+                          tuple_(bindparam("cursor_updated_at", type_=DateTime),
+                                 bindparam("cursor_id", type_=Integer)))
+    if limited:
+        stmt = stmt.limit(bindparam("limit", type_=Integer))
+    return stmt
+
+
+@lru_cache(maxsize=4)
+def notes_by_tags(mode: str, fields: Tuple[str, ...] = tuple(NOTE_COLUMNS)):
+    """Строки заметок пользователя с любым (any) или всеми (all) тегами из ``tag_ids``.
+
+    Для режима all дополнительно передается ``tag_count`` - число разных тегов.
+    """
+    note_tag = models.note_tag_association
+    matching = select(note_tag.c.note_id).where(note_tag.c.tag_id.in_(bindparam("tag_ids", expanding=True)))
+    if mode == "all":
+        matching = (matching.group_by(note_tag.c.note_id)
+                    .having(func.count(note_tag.c.tag_id.distinct()) == bindparam("tag_count", type_=Integer)))
+
+    return (select(*note_columns(fields))
+            .where(models.Note.user_id == bindparam("user_id"), models.Note.id.in_(matching)))
+
+
+def warmup_statements():
+    """Горячие запросы с параметрами, которые ничего не находят.
+
+    Выполнение на старте заполняет кэш компиляции SQLAlchemy и кэш подготовленных
+    выражений asyncpg на прогретых соединениях тем же ключом, что и у обработчиков.
+    """
+    fields = tuple(NOTE_COLUMNS)
+    return [
+        (USER_BY_TELEGRAM_ID, {"telegram_id": ""}),
+        (USER_EXISTS, {"telegram_id": ""}),
+        (NOTE_ROW_BY_OWNER, {"note_id": -1, "user_id": -1}),
+        (NOTE_HEADER_BY_OWNER, {"note_id": -1, "user_id": -1}),
+        (notes_by_owner(fields, False, False, True), {"user_id": -1, "limit": 1}),
+        (TAG_COUNTS_BY_USER, {"user_id": -1}),
+    ]
+
+
+class StatementCacheStats:
+    """Доля выполнений, которые взяли скомпилированный SQL из кэша движка."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is None:
+            return
+        if context.cache_hit is default.CACHE_HIT:
+            self.hits += 1
+        elif context.cache_hit is default.CACHE_MISS:
+            self.misses += 1
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hit_ratio}
+
+
+statement_cache_stats = StatementCacheStats()
+
+
+def install_statement_cache_stats(db_engine) -> None:
+    event.listen(db_engine.sync_engine, "before_cursor_execute", statement_cache_stats.record)
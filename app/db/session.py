@@ -1,16 +1,124 @@
+import asyncio
+import time
+from uuid import uuid4
+
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from app.core.metrics import POOL_WAIT, install_query_metrics
+from app.db.queries import install_statement_cache_stats
 from config import settings
 
 
+class PoolStats:
+    """Счетчики ожидания соединений из пула одного процесса."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float) -> None:
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        POOL_WAIT.labels(self.name).observe(wait)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # Событий начала ожидания у пула нет, поэтому замеряем выдачу соединения напрямую
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.stats.record(time.perf_counter() - started)
+
+    # engine.dispose() заменяет пул новым экземпляром: счетчики переходят к нему
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def _create_engine(url: str, name: str):
+    connect_args = {"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+                    "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    if settings.DB_PGBOUNCER:
+        # PgBouncer в режиме transaction не сохраняет подготовленные выражения между транзакциями
+        connect_args = {"statement_cache_size": 0,
+                        "prepared_statement_cache_size": 0,
+                        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__"}
+
+    db_engine = create_async_engine(url, future=True, echo=False,
+                                    poolclass=TimedQueuePool,
+                                    pool_size=settings.DB_POOL_SIZE,
+                                    max_overflow=settings.DB_MAX_OVERFLOW,
+                                    pool_timeout=settings.DB_POOL_TIMEOUT,
+                                    pool_recycle=settings.DB_POOL_RECYCLE,
+                                    pool_pre_ping=settings.DB_POOL_PRE_PING,
+                                    connect_args=connect_args)
+    db_engine.pool.stats = PoolStats(name)
+    install_statement_cache_stats(db_engine)
+    install_query_metrics(db_engine, name)
+    return db_engine
+
+
+async def warm_engine(db_engine, connections: int, statements) -> None:
+    """Открывает соединения параллельно и готовит на каждом горячие запросы."""
+    async def warm_connection():
+        async with db_engine.connect() as conn:
+            for stmt, params in statements:
+                await conn.execute(stmt, params)
+
+    # Соединения одновременно удерживаются, поэтому пул открывает их все, а не переиспользует одно
+    await asyncio.gather(*(warm_connection() for _ in range(min(connections, settings.DB_POOL_SIZE))))
+
+
+async def dispose_engines() -> None:
+    await engine.dispose()
+    if replica_engine is not engine:
+        await replica_engine.dispose()
+
+
+def pool_status(db_engine) -> dict:
+    pool = db_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": pool.stats.checkouts,
+        "wait_seconds_total": pool.stats.wait_total,
+        "wait_seconds_max": pool.stats.wait_max,
+    }
+
+
 # Создаем асинхронный движок для работы с базой данных
-engine = create_async_engine(settings.DATABASE_URL, future=True, echo=False)
+engine = _create_engine(settings.DATABASE_URL, "primary")
+
+# Движок реплики для обработчиков только на чтение; без реплики это тот же движок
+replica_engine = _create_engine(settings.DATABASE_REPLICA_URL, "replica") if settings.DATABASE_REPLICA_URL else engine
 
 # Создаем асинхронную сессию для взаимодействия с базой данных
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=AsyncSession)
+# Объекты не истекают после commit: ответ собирается из уже загруженных данных без refresh()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False,
+                            bind=engine, class_=AsyncSession)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False,
+                                bind=replica_engine, class_=AsyncSession)
 
 # Создаем функцию для получения сессии
 async def get_db():
     async with SessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+# Сессия для обработчиков, которые ничего не пишут. Без реплики это та же зависимость get_db:
+# FastAPI кэширует ее на запрос, и обработчик с get_current_user делят одно соединение,
+# а не держат два из одного пула
+if replica_engine is engine:
+    get_read_db = get_db
+else:
+    async def get_read_db():
+        async with ReadSessionLocal() as session:
+            yield session
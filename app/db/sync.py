@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, List
+
+import orjson
+
+from sqlalchemy import Integer, bindparam, func, insert, update, any_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.changes import NOTIFY_CHANNEL
+from app.db import models
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Номер изменения выдается под блокировкой строки пользователя до конца транзакции,
+# поэтому номера одного пользователя фиксируются строго по возрастанию и клиент,
+# увидевший номер N, уже видит все изменения с меньшими номерами
+BUMP_CHANGE_SEQ = (update(models.User)
+                   .where(models.User.id == bindparam("user_id"))
+                   .values(change_seq=models.User.change_seq + 1)
+                   .returning(models.User.change_seq)
+                   .execution_options(synchronize_session=False))
+
+_CHANGE_SEQ_KEY = "change_seq"
+
+# Ограничение размера уведомления: Postgres принимает до 8000 байт
+NOTIFY_MAX_IDS = 500
+
+# Ключ advisory-блокировки: уплотнение выполняет только один воркер
+COMPACT_LOCK_ID = 0x6e6f7465
+
+
+async def change_seq(db: AsyncSession, user_id: int) -> int:
+    """Номер изменения для текущей транзакции; все записи транзакции получают один номер.
+
+    Вызывается первой записью транзакции, до тегов, ``note_tag`` и ``user_tag_counts``:
+    все пути записи берут блокировки в одном порядке и не взаимоблокируются.
+    """
+    cached = db.info.get(_CHANGE_SEQ_KEY)
+    if cached is not None and cached[0] is db.sync_session.get_transaction() and cached[1] == user_id:
+        return cached[2]
+
+    seq = (await db.execute(BUMP_CHANGE_SEQ, {"user_id": user_id})).scalar_one()
+    db.info[_CHANGE_SEQ_KEY] = (db.sync_session.get_transaction(), user_id, seq)
+    return seq
+
+
+async def notify_change(db: AsyncSession, user_id: int, event: str, note_ids: Iterable[int]) -> None:
+    """Ставит NOTIFY в текущую транзакцию: подписчики получат его только после commit."""
+    if not settings.NOTES_NOTIFY_ENABLED:
+        return
+    seq = await change_seq(db, user_id)
+    note_ids = list(note_ids)
+    payload = {"user_id": user_id, "event": event, "seq": seq}
+    if len(note_ids) <= NOTIFY_MAX_IDS:
+        payload["note_ids"] = note_ids
+    await db.execute(select(func.pg_notify(NOTIFY_CHANNEL, orjson.dumps(payload).decode())))
+
+
+async def touch_notes(db: AsyncSession, user_id: int, note_ids: List[int]) -> None:
+    """Отмечает изменение заметок, у которых поменялся только набор тегов."""
+    note_ids = list(dict.fromkeys(note_ids))
+    if not note_ids:
+        return
+    seq = await change_seq(db, user_id)
+    await db.execute(update(models.Note)
+                     .where(models.Note.id == any_(bindparam("note_ids", note_ids, type_=ARRAY(Integer))),
+                            models.Note.user_id == user_id)
+                     .values(change_seq=seq)
+                     .execution_options(synchronize_session=False))
+
+
+async def record_deletes(db: AsyncSession, user_id: int, note_ids: List[int]) -> None:
+    if not note_ids:
+        return
+    seq = await change_seq(db, user_id)
+    await db.execute(insert(models.NoteTombstone),
+                     [{"note_id": note_id, "user_id": user_id, "change_seq": seq} for note_id in note_ids])
+
+
+async def compact_tombstones(db: AsyncSession, before: datetime) -> int:
+    """Удаляет надгробия старше ``before`` и сдвигает горизонт синхронизации их владельцев.
+
+    Возвращает число удаленных надгробий или -1, если уплотнение уже идет в другом воркере.
+    """
+    locked = (await db.execute(select(func.pg_try_advisory_xact_lock(COMPACT_LOCK_ID)))).scalar()
+    if not locked:
+        return -1
+
+    tombstone = models.NoteTombstone
+    result = await db.execute(tombstone.__table__.delete()
+                              .where(tombstone.deleted_at < before)
+                              .returning(tombstone.user_id, tombstone.change_seq))
+    rows = result.all()
+    horizons = {}
+    for user_id, seq in rows:
+        horizons[user_id] = max(seq, horizons.get(user_id, 0))
+
+    if horizons:
+        await db.execute(update(models.User.__table__)
+                         .where(models.User.id == bindparam("uid"))
+                         .values(sync_horizon=func.greatest(models.User.sync_horizon, bindparam("horizon"))),
+                         [{"uid": user_id, "horizon": seq} for user_id, seq in horizons.items()])
+    return len(rows)
+
+
+async def compact_loop(session_factory, interval: float, retention: timedelta) -> None:
+    while True:
+        try:
+            async with session_factory() as db:
+                deleted = await compact_tombstones(db, datetime.utcnow() - retention)
+                await db.commit()
+            if deleted > 0:
+                logger.info("Compacted %d note tombstones", deleted)
+        except Exception:
+            logger.warning("Tombstone compaction failed", exc_info=True)
+        await asyncio.sleep(interval)
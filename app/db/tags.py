@@ -0,0 +1,143 @@
+from collections import Counter
+from typing import Iterable, List, Set, Tuple
+
+from sqlalchemy import JSON, delete, func, literal_column, tuple_, type_coerce
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db import models
+from app.db.sync import change_seq, touch_notes
+
+
+def _unique(names: Iterable[str]) -> List[str]:
+    # Убираем повторы, сохраняя порядок тегов из запроса
+    return list(dict.fromkeys(names))
+
+
+async def get_tags(db: AsyncSession, names: Iterable[str]) -> List[models.Tag]:
+    """Находит существующие теги одним запросом ``IN``, не создавая новых."""
+    names = _unique(names)
+    if not names:
+        return []
+
+    result = await db.execute(select(models.Tag).filter(models.Tag.name.in_(names)))
+    by_name = {tag.name: tag for tag in result.scalars()}
+    return [by_name[name] for name in names if name in by_name]
+
+
+async def resolve_tags(db: AsyncSession, names: Iterable[str]) -> List[models.Tag]:
+    """Возвращает теги по именам, создавая недостающие.
+
+    Стоимость не зависит от количества тегов: один ``SELECT ... IN`` и один
+    ``INSERT ... ON CONFLICT DO NOTHING RETURNING`` для отсутствующих.
+    """
+    names = _unique(names)
+    if not names:
+        return []
+
+    tags = {tag.name: tag for tag in await get_tags(db, names)}
+    missing = [name for name in names if name not in tags]
+
+    if missing:
+        # Вставка в одном порядке имен: параллельные транзакции не блокируют друг друга крест-накрест
+        stmt = (insert(models.Tag)
+                .values([{"name": name} for name in sorted(missing)])
+                .on_conflict_do_nothing(index_elements=[models.Tag.name])
+                .returning(models.Tag))
+        result = await db.scalars(stmt)
+        tags.update({tag.name: tag for tag in result})
+
+        # Строки, вставленные параллельной транзакцией, ON CONFLICT не возвращает
+        lost = [name for name in missing if name not in tags]
+        if lost:
+            tags.update({tag.name: tag for tag in await get_tags(db, lost)})
+
+    return [tags[name] for name in names]
+
+
+async def attach_tags(db: AsyncSession, user_id: int, note_id: int, tags: Iterable[models.Tag]) -> None:
+    """Связывает новую заметку с тегами одним многострочным INSERT в ``note_tag``."""
+    await link_tags(db, user_id, [(note_id, tag.id) for tag in tags], touch=False)
+
+
+async def link_tags(db: AsyncSession, user_id: int, pairs: Iterable[Tuple[int, int]],
+                    touch: bool = True) -> Set[Tuple[int, int]]:
+    """Вставляет пары (note_id, tag_id) одним INSERT и возвращает действительно добавленные.
+
+    ``touch`` выдает измененным заметкам новый номер изменения; для только что
+    созданных заметок он уже выдан при вставке.
+    """
+    rows = [{"note_id": note_id, "tag_id": tag_id} for note_id, tag_id in dict.fromkeys(pairs)]
+    if not rows:
+        return set()
+
+    await change_seq(db, user_id)
+    note_tag = models.note_tag_association
+    result = await db.execute(insert(note_tag)
+                              .values(rows)
+                              .on_conflict_do_nothing()
+                              .returning(note_tag.c.note_id, note_tag.c.tag_id))
+    added = {tuple(row) for row in result.all()}
+    await adjust_tag_counts(db, user_id, added, 1)
+    if touch:
+        await touch_notes(db, user_id, [note_id for note_id, _ in added])
+    return added
+
+
+async def unlink_tags(db: AsyncSession, user_id: int, pairs: Iterable[Tuple[int, int]]) -> Set[Tuple[int, int]]:
+    """Удаляет пары (note_id, tag_id) одним DELETE и возвращает действительно удаленные."""
+    pairs = list(dict.fromkeys(pairs))
+    if not pairs:
+        return set()
+
+    await change_seq(db, user_id)
+    note_tag = models.note_tag_association
+    result = await db.execute(delete(note_tag)
+                              .where(tuple_(note_tag.c.note_id, note_tag.c.tag_id).in_(pairs))
+                              .returning(note_tag.c.note_id, note_tag.c.tag_id))
+    removed = {tuple(row) for row in result.all()}
+    await adjust_tag_counts(db, user_id, removed, -1)
+    await touch_notes(db, user_id, [note_id for note_id, _ in removed])
+    return removed
+
+
+async def adjust_tag_counts(db: AsyncSession, user_id: int, pairs: Iterable[Tuple[int, int]], delta: int) -> None:
+    """Поддерживает счетчики заметок пользователя по тегам для словаря тегов."""
+    counts = Counter(tag_id for _, tag_id in pairs)
+    if not counts:
+        return
+
+    stmt = insert(models.UserTagCount).values(
+        [{"user_id": user_id, "tag_id": tag_id, "count": count * delta} for tag_id, count in counts.items()])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.UserTagCount.user_id, models.UserTagCount.tag_id],
+        set_={"count": models.UserTagCount.count + stmt.excluded.count},
+    )
+    await db.execute(stmt)
+
+    if delta < 0:
+        await db.execute(delete(models.UserTagCount).where(models.UserTagCount.user_id == user_id,
+                                                           models.UserTagCount.count <= 0))
+
+
+def notes_with_tags(tag_ids: List[int], mode: str = "any"):
+    """Полусоединение по ``note_tag``: id заметок с любым (any) или всеми (all) тегами."""
+    note_tag = models.note_tag_association
+    stmt = select(note_tag.c.note_id).where(note_tag.c.tag_id.in_(tag_ids))
+    if mode == "all":
+        stmt = (stmt.group_by(note_tag.c.note_id)
+                .having(func.count(note_tag.c.tag_id.distinct()) == len(set(tag_ids))))
+    return stmt
+
+
+def note_tags_json(note_id):
+    """Коррелированный подзапрос: теги заметки одним JSON-массивом ``[{id, name}]``."""
+    note_tag = models.note_tag_association
+    tags = (select(func.coalesce(func.json_agg(func.json_build_object("id", models.Tag.id, "name", models.Tag.name)),
+                                 literal_column("'[]'::json")))
+            .select_from(note_tag.join(models.Tag, models.Tag.id == note_tag.c.tag_id))
+            .where(note_tag.c.note_id == note_id)
+            .correlate_except(note_tag, models.Tag)
+            .scalar_subquery())
+    return type_coerce(tags, JSON)
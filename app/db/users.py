@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.bloom import BloomFilter
+from app.core.cache import TTLCache
+from app.core.changes import USERS_CHANNEL, ChangeHub
+from app.core.metrics import USER_CHECKS
+from app.db import queries
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних id перечитывать при обновлении: транзакции регистрации
+# фиксируются не строго в порядке id, и без перекрытия поздние строки терялись бы
+REFRESH_OVERLAP = 1000
+
+
+class RegisteredUsers:
+    """Проверка существования telegram_id без чтения строки пользователя.
+
+    Подтвержденные пользователи лежат в LRU-кэше, ответ "возможно" уходит в базу
+    как SELECT EXISTS. Регистрации из других воркеров приходят уведомлением
+    USERS_CHANNEL и фоновым обновлением по id. Отрицательный ответ фильтра
+    окончательный, только пока уведомления доходят: соединение LISTEN открыто
+    и фильтр обновлен после его подключения. Иначе регистрация из другого
+    воркера могла пройти мимо фильтра, и отрицательный ответ проверяется в базе.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, known_size: int, known_ttl: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.known = TTLCache(maxsize=known_size, ttl=known_ttl)
+        self.bloom: Optional[BloomFilter] = None
+        self.hub: Optional[ChangeHub] = None
+        self._last_id = 0
+        # Начало чтения, на котором основано последнее обновление фильтра
+        self._refreshed_at: Optional[float] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+    def follow(self, hub: ChangeHub) -> None:
+        """Подписка на регистрации; вызывается до hub.start()."""
+        self.hub = hub
+        hub.listen(USERS_CHANNEL, self._on_registered)
+
+    def _on_registered(self, connection, pid, channel, payload) -> None:
+        if self.bloom is not None:
+            self.bloom.add(payload)
+
+    async def load(self, session_factory, refresh_interval: float) -> None:
+        started = time.monotonic()
+        async with session_factory() as db:
+            count = (await db.execute(queries.USERS_COUNT)).scalar()
+            # Запас по емкости, чтобы доля ложных срабатываний не росла с регистрациями
+            bloom = BloomFilter(max(self.capacity, count * 2), self.error_rate)
+            last_id = await self._fill(db, bloom, 0)
+        self.bloom, self._last_id, self._refreshed_at = bloom, last_id, started
+
+        if refresh_interval > 0 and self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop(session_factory, refresh_interval))
+
+    @staticmethod
+    async def _fill(db: AsyncSession, bloom: BloomFilter, after_id: int) -> int:
+        result = await db.stream(queries.USERS_AFTER_ID.execution_options(yield_per=10000), {"after_id": after_id})
+        last_id = after_id
+        async for user_id, telegram_id in result:
+            bloom.add(telegram_id)
+            last_id = max(last_id, user_id)
+        return last_id
+
+    async def _refresh_loop(self, session_factory, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                started = time.monotonic()
+                async with session_factory() as db:
+                    after_id = max(0, self._last_id - REFRESH_OVERLAP)
+                    self._last_id = max(self._last_id, await self._fill(db, self.bloom, after_id))
+                self._refreshed_at = started
+            except Exception:
+                logger.warning("Registered users refresh failed", exc_info=True)
+
+    async def close(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+
+    def add(self, telegram_id: str) -> None:
+        if self.bloom is not None:
+            self.bloom.add(telegram_id)
+        self.known.set(telegram_id, True)
+
+    def invalidate(self, telegram_id: str) -> None:
+        self.known.invalidate(telegram_id)
+
+    def _negatives_final(self) -> bool:
+        connected_at = self.hub.connected_at if self.hub is not None else None
+        return (connected_at is not None and self._refreshed_at is not None
+                and self._refreshed_at >= connected_at)
+
+    def _cached(self, telegram_id: str) -> Optional[bool]:
+        if self.known.get(telegram_id):
+            USER_CHECKS.labels("known").inc()
+            return True
+        if self.bloom is not None and telegram_id not in self.bloom and self._negatives_final():
+            USER_CHECKS.labels("bloom").inc()
+            return False
+        return None
+
+    async def exists(self, db: AsyncSession, telegram_id: str) -> bool:
+        found = self._cached(telegram_id)
+        if found is None:
+            USER_CHECKS.labels("db").inc()
+            found = bool((await db.execute(queries.USER_EXISTS, {"telegram_id": telegram_id})).scalar())
+            if found:
+                self.known.set(telegram_id, True)
+        return found
+
+    async def exists_many(self, db: AsyncSession, telegram_ids: Iterable[str]) -> Dict[str, bool]:
+        answers = {telegram_id: self._cached(telegram_id) for telegram_id in telegram_ids}
+        maybe = [telegram_id for telegram_id, found in answers.items() if found is None]
+        if maybe:
+            # Все неопределенные ответы одним запросом
+            USER_CHECKS.labels("db").inc(len(maybe))
+            result = await db.execute(queries.EXISTING_TELEGRAM_IDS, {"telegram_ids": maybe})
+            existing = set(result.scalars())
+            for telegram_id in maybe:
+                answers[telegram_id] = telegram_id in existing
+                if telegram_id in existing:
+                    self.known.set(telegram_id, True)
+        return answers
+
+
+async def notify_registered(db: AsyncSession, telegram_id: str) -> None:
+    """Ставит уведомление о регистрации в текущую транзакцию: воркеры получат его после commit."""
+    if settings.NOTES_NOTIFY_ENABLED:
+        await db.execute(select(func.pg_notify(USERS_CHANNEL, telegram_id)))
+
+
+registered_users = RegisteredUsers(settings.USER_FILTER_CAPACITY, settings.USER_FILTER_ERROR_RATE,
+                                   known_size=settings.USER_CACHE_SIZE,
+                                   known_ttl=settings.USER_CACHE_TTL_SECONDS)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, field_validator
+from typing import List, Literal, Optional
 from datetime import datetime
 
 
@@ -10,6 +10,10 @@ class Tag(BaseModel):
     class Config:
         from_attributes = True
 
+class TagCount(Tag):
+    count: int
+
+
 class NoteBase(BaseModel):
     title: str
     content: str
@@ -20,6 +24,10 @@ class NoteCreate(NoteBase):
 
 class Note(NoteBase):
     id: int
+    # Текста нет в ответе при include_content=false; его отдает /notes/notes/{id}/content
+    content: Optional[str] = None
+    content_length: Optional[int] = None
+    content_hash: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     tags: List[Tag]
@@ -33,4 +41,99 @@ class NoteUpdate(BaseModel):
     content: Optional[str] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Элемент списка заметок: при проекции fields заполнены только выбранные поля
+class NoteItem(BaseModel):
+    id: Optional[int] = None
+    title: Optional[str] = None
+    content: Optional[str] = None
+    content_length: Optional[int] = None
+    content_hash: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    tags: Optional[List[Tag]] = None
+
+
+class NotePage(BaseModel):
+    items: List[NoteItem]
+    next_cursor: Optional[str] = None
+
+
+# Строка импорта: формат /notes/export, теги можно передать и просто именами
+class NoteImport(BaseModel):
+    # Заголовок в Note обязателен: пустой или null из файла сохраняется пустой строкой
+    title: str = ""
+    content: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    tags: List[str] = []
+
+    @field_validator("title", mode="before")
+    @classmethod
+    def title_or_empty(cls, title):
+        return "" if title is None else title
+
+    @field_validator("tags", mode="before")
+    @classmethod
+    def tag_names(cls, tags):
+        return [tag["name"] if isinstance(tag, dict) else tag for tag in tags or []]
+
+
+class NoteImportResult(BaseModel):
+    notes: int
+    tag_links: int
+    seconds: float
+
+
+class NoteSync(BaseModel):
+    changes: List[Note]
+    deleted: List[int]
+    next_cursor: Optional[str]
+    has_more: bool
+    # Курсор старше удаленных надгробий: клиент должен загрузить заметки заново без since
+    reset: bool = False
+
+
+class NoteSearchResult(Note):
+    rank: float = 0.0
+    snippet: Optional[str] = None
+
+
+class NoteBatchCreate(BaseModel):
+    notes: List[NoteCreate]
+
+
+class NoteBatchUpdateItem(NoteUpdate):
+    id: int
+
+
+class NoteBatchUpdate(BaseModel):
+    notes: List[NoteBatchUpdateItem]
+
+
+class NoteBatchDelete(BaseModel):
+    ids: List[int]
+
+
+class TagOperation(BaseModel):
+    note_id: int
+    tag: str
+    action: Literal["add", "remove"] = "add"
+
+
+class NoteBatchTags(BaseModel):
+    operations: List[TagOperation]
+
+
+# Результат отдельной операции пакета: ошибка одной операции не отменяет остальные
+class BatchItemResult(BaseModel):
+    index: int
+    ok: bool
+    note_id: Optional[int] = None
+    note: Optional[Note] = None
+    error: Optional[str] = None
+
+
+class BatchResult(BaseModel):
+    results: List[BatchItemResult]
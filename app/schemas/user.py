@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic import BaseModel
 
 class UserBase(BaseModel):
@@ -23,3 +25,6 @@ class UserWithToken(BaseModel):
 
     class Config:
         from_attributes = True
+
+class UserCheck(BaseModel):
+    telegram_ids: List[str]
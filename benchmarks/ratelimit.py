@@ -0,0 +1,75 @@
+"""Задержка, которую добавляет проверка лимита в каждом режиме (local, hybrid, redis).
+
+Режимы с Redis требуют доступного сервера:
+
+    BENCH_REDIS_URL=redis://localhost:6379/15 python -m benchmarks.ratelimit --requests 20000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from redis.asyncio import Redis
+
+from app.core.ratelimit import HybridBackend, Limit, LocalBackend, RedisBackend
+
+# Лимит заведомо не достигается: измеряем только накладные расходы проверки
+LIMIT = Limit(times=10 ** 9, seconds=60)
+
+
+def percentile(timings, q: float) -> float:
+    return statistics.quantiles(timings, n=100)[int(q) - 1]
+
+
+async def measure(backend, requests: int, concurrency: int, users: int):
+    timings = []
+
+    async def client(worker: int):
+        for i in range(worker, requests, concurrency):
+            started = time.perf_counter()
+            await backend.hit(f"bench:notes:user:{i % users}", 1, LIMIT)
+            timings.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(client(worker) for worker in range(concurrency)))
+    await backend.close()
+    return timings
+
+
+async def run(redis_url: str, requests: int, concurrency: int, users: int):
+    redis = Redis.from_url(redis_url, decode_responses=True)
+    try:
+        await redis.ping()
+    except Exception:
+        print(f"Redis at {redis_url} is unavailable, only the local mode will be measured")
+        redis = None
+
+    backends = {"local": LocalBackend(max_keys=users)}
+    if redis is not None:
+        backends["hybrid"] = HybridBackend(max_keys=users, flush_interval=0.5)
+        backends["redis"] = RedisBackend()
+
+    print(f"{'mode':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for mode, backend in backends.items():
+        if redis is not None:
+            backend.init(redis)
+        timings = await measure(backend, requests, concurrency, users)
+        print(f"{mode:>8} {percentile(timings, 50):>8.3f} {percentile(timings, 99):>8.3f} {max(timings):>8.3f}")
+
+    if redis is not None:
+        await redis.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    redis_url = os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15")
+    asyncio.run(run(redis_url, args.requests, args.concurrency, args.users))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Ответов в секунду на этапе сериализации списка заметок: ORM + Pydantic против строк + orjson.
+
+Базе данных не нужна: оба пути получают одни и те же 1000 заметок в памяти.
+Старый путь повторяет то, что FastAPI делает с response_model=List[schemas.Note]:
+валидацию объектов через from_attributes, сериализацию модели и json.dumps.
+
+    python -m benchmarks.serialization --notes 1000 --seconds 3
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter
+
+from app.schemas import note as schemas
+
+
+def make_notes(count: int, tags_per_note: int = 3):
+    now = datetime.utcnow()
+    tags = [{"id": i, "name": f"tag{i}"} for i in range(50)]
+    rows = [{"id": i, "title": f"Note {i}", "content": "lorem ipsum dolor sit amet " * 20,
+             "created_at": now, "updated_at": now,
+             "tags": [tags[(i + j) % len(tags)] for j in range(tags_per_note)]}
+            for i in range(count)]
+    orm_like = [SimpleNamespace(**{**row, "tags": [SimpleNamespace(**tag) for tag in row["tags"]]}) for row in rows]
+    return orm_like, rows
+
+
+def rate(func, seconds: float) -> float:
+    done = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        func()
+        done += 1
+    return done / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    orm_like, rows = make_notes(args.notes)
+    adapter = TypeAdapter(List[schemas.Note])
+
+    def pydantic_path():
+        notes = adapter.validate_python(orm_like, from_attributes=True)
+        return json.dumps(adapter.dump_python(notes, mode="json")).encode()
+
+    def orjson_path():
+        return orjson.dumps({"items": rows, "next_cursor": None})
+
+    before = rate(pydantic_path, args.seconds)
+    after = rate(orjson_path, args.seconds)
+    print(f"{args.notes} notes: pydantic {before:.1f} resp/s, orjson rows {after:.1f} resp/s, x{after / before:.1f}")
+
+
+if __name__ == "__main__":
+    main()
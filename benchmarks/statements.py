@@ -0,0 +1,65 @@
+"""CPU на подготовку запроса при попадании в кэш компиляции: сборка на каждый вызов против заранее собранного.
+
+Базе данных не нужна: замеряется сборка выражения и вычисление ключа кэша,
+которые SQLAlchemy выполняет перед каждым обращением к кэшу компиляции.
+
+    python -m benchmarks.statements --iterations 20000
+"""
+import argparse
+import time
+
+from sqlalchemy.future import select
+
+from app.db import models, queries
+
+
+def rebuilt_user(telegram_id):
+    return select(models.User).filter(models.User.telegram_id == telegram_id)
+
+
+def rebuilt_note(note_id, user_id):
+    return (select(*queries.note_columns())
+            .filter(models.Note.id == note_id, models.Note.user_id == user_id))
+
+
+def per_call_us(func, iterations: int) -> float:
+    started = time.process_time()
+    for i in range(iterations):
+        func(i)
+    return (time.process_time() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    cases = {
+        "user by telegram_id": (
+            lambda i: rebuilt_user(str(i))._generate_cache_key(),
+            lambda i: queries.USER_BY_TELEGRAM_ID._generate_cache_key(),
+        ),
+        "note by id + owner": (
+            lambda i: rebuilt_note(i, i)._generate_cache_key(),
+            lambda i: queries.NOTE_ROW_BY_OWNER._generate_cache_key(),
+        ),
+        "notes by owner": (
+            lambda i: queries.notes_by_owner.__wrapped__(("id", "title", "tags"), False, True, True)
+            ._generate_cache_key(),
+            lambda i: queries.notes_by_owner(("id", "title", "tags"), False, True, True)._generate_cache_key(),
+        ),
+        "notes by tags": (
+            lambda i: queries.notes_by_tags.__wrapped__("all")._generate_cache_key(),
+            lambda i: queries.notes_by_tags("all")._generate_cache_key(),
+        ),
+    }
+
+    print(f"{'query':>22} {'rebuilt us':>11} {'prebuilt us':>12} {'saved us':>9}")
+    for name, (rebuilt, prebuilt) in cases.items():
+        rebuilt_us = per_call_us(rebuilt, args.iterations)
+        prebuilt_us = per_call_us(prebuilt, args.iterations)
+        print(f"{name:>22} {rebuilt_us:>11.1f} {prebuilt_us:>12.1f} {rebuilt_us - prebuilt_us:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Сколько простаивающих подписчиков /notes/stream держит один воркер и сколько стоит раздача.
+
+Базе данных не нужна: подписчики создаются в ChangeHub напрямую, и каждому
+соответствует задача, ожидающая очередь, как генератор SSE-ответа. Сетевые
+буферы соединений в замер не входят, их стоит добавить по данным ОС.
+
+    python -m benchmarks.stream --subscribers 1000 10000 50000 --users 1000
+"""
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+
+from app.core.changes import ChangeHub
+
+
+async def consume(subscriber):
+    while True:
+        await subscriber.queue.get()
+
+
+async def measure(subscribers: int, users: int, buffer: int):
+    hub = ChangeHub(max_subscribers=subscribers, buffer=buffer)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    tasks = []
+    for i in range(subscribers):
+        subscriber = hub.subscribe(i % users)
+        tasks.append(asyncio.create_task(consume(subscriber)))
+    await asyncio.sleep(0)
+    per_subscriber = (tracemalloc.get_traced_memory()[0] - before) / subscribers
+    tracemalloc.stop()
+
+    # Уведомление одному пользователю: subscribers / users получателей
+    started = time.perf_counter()
+    for user_id in range(users):
+        hub.publish(user_id, {"event": "update", "seq": 1, "note_ids": [1]})
+    publish_us = (time.perf_counter() - started) / users * 1e6
+
+    # Переподключение LISTEN: событие всем сразу
+    started = time.perf_counter()
+    hub.broadcast({"event": "resync"})
+    broadcast_ms = (time.perf_counter() - started) * 1000
+    await asyncio.sleep(0)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return per_subscriber, publish_us, broadcast_ms
+
+
+async def slow_consumer(buffer: int):
+    # Клиент, который не читает поток, отключается после заполнения буфера
+    hub = ChangeHub(max_subscribers=1, buffer=buffer)
+    subscriber = hub.subscribe(1)
+    sent = 0
+    while hub.count:
+        hub.publish(1, {"event": "update", "seq": sent})
+        sent += 1
+    return sent, subscriber.dropped.is_set()
+
+
+async def run(sizes, users: int, buffer: int):
+    print(f"{'subscribers':>12} {'bytes/sub':>10} {'publish us':>11} {'broadcast ms':>13}")
+    for size in sizes:
+        per_subscriber, publish_us, broadcast_ms = await measure(size, users, buffer)
+        print(f"{size:>12} {per_subscriber:>10.0f} {publish_us:>11.1f} {broadcast_ms:>13.1f}")
+
+    sent, dropped = await slow_consumer(buffer)
+    print(f"slow consumer dropped={dropped} after {sent} events (buffer {buffer})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--buffer", type=int, default=100)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.subscribers, args.users, args.buffer))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,65 @@ load_dotenv()
 class Settings(BaseSettings):
     # Основные параметры приложения
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # Реплика для чтения списков, заметок и поиска. Запись из нее видна с задержкой репликации,
+    # которую кэш ответов может закрепить до истечения TTL
+    DATABASE_REPLICA_URL: str = os.getenv("DATABASE_REPLICA_URL", "")
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     ALGORITHM: str = os.getenv("ALGORITHM")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
+    # Хэширование паролей: стоимость bcrypt и ограничения пула потоков
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 16))
+
+    # Кэш аутентификации в памяти процесса (0 отключает кэш)
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", 300))
+    # Фильтр Блума зарегистрированных telegram_id для check_user. Регистрации других воркеров
+    # приходят через LISTEN (NOTES_NOTIFY_ENABLED); без него отрицательные ответы проверяются в базе
+    USER_FILTER_CAPACITY: int = int(os.getenv("USER_FILTER_CAPACITY", 1000000))
+    USER_FILTER_ERROR_RATE: float = float(os.getenv("USER_FILTER_ERROR_RATE", 0.01))
+    USER_FILTER_REFRESH_SECONDS: float = float(os.getenv("USER_FILTER_REFRESH_SECONDS", 1.0))
+    USER_CHECK_MAX_BATCH: int = int(os.getenv("USER_CHECK_MAX_BATCH", 1000))
+
+    # Пагинация списка заметок
+    NOTES_PAGE_SIZE: int = int(os.getenv("NOTES_PAGE_SIZE", 100))
+    NOTES_MAX_PAGE_SIZE: int = int(os.getenv("NOTES_MAX_PAGE_SIZE", 1000))
+    NOTES_STREAM_BATCH_SIZE: int = int(os.getenv("NOTES_STREAM_BATCH_SIZE", 500))
+
+    # Экспорт и импорт заметок NDJSON
+    NOTES_EXPORT_CHUNK_BYTES: int = int(os.getenv("NOTES_EXPORT_CHUNK_BYTES", 65536))
+    NOTES_IMPORT_CHUNK_SIZE: int = int(os.getenv("NOTES_IMPORT_CHUNK_SIZE", 5000))
+    NOTES_IMPORT_MAX_LINE_BYTES: int = int(os.getenv("NOTES_IMPORT_MAX_LINE_BYTES", 1048576))
+
+    # Поток изменений /notes/stream: NOTIFY из путей записи и LISTEN в каждом воркере
+    NOTES_NOTIFY_ENABLED: bool = os.getenv("NOTES_NOTIFY_ENABLED", "true").lower() == "true"
+    NOTES_STREAM_MAX_SUBSCRIBERS: int = int(os.getenv("NOTES_STREAM_MAX_SUBSCRIBERS", 10000))
+    # Сколько событий ждут медленного клиента, прежде чем его отключить
+    NOTES_STREAM_BUFFER: int = int(os.getenv("NOTES_STREAM_BUFFER", 100))
+    NOTES_STREAM_HEARTBEAT_SECONDS: float = float(os.getenv("NOTES_STREAM_HEARTBEAT_SECONDS", 15))
+    NOTES_STREAM_MAX_SECONDS: float = float(os.getenv("NOTES_STREAM_MAX_SECONDS", 300))
+    # LISTEN не работает через PgBouncer в режиме transaction: здесь можно указать прямое подключение
+    DATABASE_LISTEN_URL: str = os.getenv("DATABASE_LISTEN_URL", os.getenv("DATABASE_URL", ""))
+
+    # Синхронизация: сколько хранить надгробия удаленных заметок и как часто их уплотнять
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", 30))
+    SYNC_COMPACT_INTERVAL_SECONDS: float = float(os.getenv("SYNC_COMPACT_INTERVAL_SECONDS", 3600))
+
+    # Пул соединений каждого воркера gunicorn
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", -1))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+    # Сколько соединений открыть и прогреть при старте воркера (не больше DB_POOL_SIZE)
+    DB_POOL_WARM_CONNECTIONS: int = int(os.getenv("DB_POOL_WARM_CONNECTIONS", 2))
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+    # Работа через PgBouncer в режиме transaction: кэш подготовленных выражений отключается
+    DB_PGBOUNCER: bool = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
     # Параметры для подключения к базе данных
     DB_USER: str = os.getenv("DB_USER")
     DB_PASS: str = os.getenv("DB_PASS")
@@ -22,4 +77,22 @@ class Settings(BaseSettings):
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", 6379))
 
+    # Лимит запросов: backend redis (точный), local (в памяти воркера) или hybrid
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "redis")
+    RATE_LIMIT_TIMES: int = int(os.getenv("RATE_LIMIT_TIMES", 100))
+    RATE_LIMIT_SECONDS: int = int(os.getenv("RATE_LIMIT_SECONDS", 60))
+    # Лимиты отдельных маршрутов по имени обработчика: "check_user=600/60,login=10/60", 0 отключает
+    RATE_LIMITS: str = os.getenv("RATE_LIMITS", "")
+    RATE_LIMIT_LOCAL_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_LOCAL_MAX_KEYS", 100000))
+    RATE_LIMIT_FLUSH_INTERVAL: float = float(os.getenv("RATE_LIMIT_FLUSH_INTERVAL", 0.5))
+    # Пакетные операции списывают лимит по числу элементов
+    NOTES_BATCH_MAX_SIZE: int = int(os.getenv("NOTES_BATCH_MAX_SIZE", 100))
+
+    # Кэш ответов чтения заметок в Redis
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_TTL_SECONDS: int = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 300))
+
+    # Наблюдаемость: запросы дольше порога (мс) пишутся в журнал вместе с SQL, 0 отключает
+    SLOW_REQUEST_LOG_MS: int = int(os.getenv("SLOW_REQUEST_LOG_MS", 0))
+
 settings = Settings()
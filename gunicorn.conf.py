@@ -0,0 +1,11 @@
+import os
+
+from prometheus_client import multiprocess
+
+# Сколько воркер ждет завершения запросов в работе перед остановкой
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+
+def child_exit(server, worker):
+    # Файлы метрик завершившегося воркера больше не обновляются
+    multiprocess.mark_process_dead(worker.pid)
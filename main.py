@@ -1,13 +1,88 @@
+import time
+
+# Время импорта приложения попадает в отчет о старте воркера
+IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+from datetime import timedelta
+
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi_limiter import FastAPILimiter
-from fastapi_limiter.depends import RateLimiter
+from fastapi.responses import ORJSONResponse
 from redis.asyncio import Redis
 
-from app.api import auth, notes
+from app.api import auth, batch, notes, transfer
+from app.core.changes import change_hub
+from app.core.metrics import MetricsMiddleware, metrics_response
+from app.core.ratelimit import rate_limit, rate_limiter
+from app.core.response_cache import response_cache
+from app.db.queries import statement_cache_stats, warmup_statements
+from app.db.session import SessionLocal, engine, replica_engine, pool_status, warm_engine, dispose_engines
+from app.db.sync import compact_loop
+from app.db.users import registered_users
 from config import settings
 
-app = FastAPI(dependencies=[Depends(RateLimiter(times=100, seconds=60))])
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+
+# Логгер uvicorn попадает в журнал gunicorn без отдельной настройки logging
+logger = logging.getLogger("uvicorn.error")
+
+
+async def _warm_up(redis_clients) -> None:
+    engines = [engine] if replica_engine is engine else [engine, replica_engine]
+    tasks = [warm_engine(db_engine, settings.DB_POOL_WARM_CONNECTIONS, warmup_statements()) for db_engine in engines]
+    tasks += [client.ping() for client in redis_clients]
+    tasks.append(registered_users.load(SessionLocal, settings.USER_FILTER_REFRESH_SECONDS))
+
+    # Без прогрева воркер все равно работает, просто первые запросы медленнее
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(result, Exception):
+            logger.warning("Warm-up step failed: %r", result)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+
+    redis = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, decode_responses=True)
+    rate_limiter.init(redis)
+    redis_clients = [redis]
+
+    if settings.RESPONSE_CACHE_ENABLED:
+        # Кэшу ответов нужны байты, поэтому отдельный клиент без decode_responses
+        response_cache.redis = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+        redis_clients.append(response_cache.redis)
+
+    await _warm_up(redis_clients)
+    logger.info("Worker ready: imports %.0fms, warm-up %.0fms",
+                IMPORT_SECONDS * 1000, (time.perf_counter() - started) * 1000)
+
+    if settings.NOTES_NOTIFY_ENABLED:
+        registered_users.follow(change_hub)
+        change_hub.start(settings.DATABASE_LISTEN_URL)
+
+    compactor = asyncio.create_task(compact_loop(SessionLocal, settings.SYNC_COMPACT_INTERVAL_SECONDS,
+                                                 timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)))
+
+    yield
+
+    compactor.cancel()
+    with suppress(asyncio.CancelledError):
+        await compactor
+    # Сюда uvicorn приходит после завершения запросов в работе (не дольше graceful_timeout)
+    await change_hub.close()
+    await registered_users.close()
+    # Гибридный режим досылает накопленные списания в Redis
+    await rate_limiter.backend.close()
+    for client in redis_clients:
+        await client.aclose()
+    response_cache.redis = None
+    await dispose_engines()
+
+
+app = FastAPI(default_response_class=ORJSONResponse, dependencies=[Depends(rate_limit)], lifespan=lifespan)
 
 origins = [
     "http://localhost",
@@ -22,11 +97,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware, slow_request_ms=settings.SLOW_REQUEST_LOG_MS)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
+
+@app.get("/metrics/db")
+async def db_metrics():
+    # Состояние пулов соединений текущего воркера
+    metrics = {"primary": pool_status(engine), "statement_cache": statement_cache_stats.as_dict()}
+    if replica_engine is not engine:
+        metrics["replica"] = pool_status(replica_engine)
+    return metrics
 
-@app.on_event("startup")
-async def on_startup():
-    redis = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, decode_responses=True)
-    await FastAPILimiter.init(redis)
 
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
-app.include_router(notes.router, prefix="/notes", tags=["notes"])
\ No newline at end of file
+app.include_router(notes.router, prefix="/notes", tags=["notes"])
+app.include_router(batch.router, prefix="/notes/batch", tags=["notes"])
+app.include_router(transfer.router, prefix="/notes", tags=["notes"])
\ No newline at end of file
@@ -23,5 +23,9 @@ echo "База данных доступна!"
 # Выполнение миграций Alembic
 poetry run alembic upgrade head
 
-# Запуск Gunicorn с UvicornWorker
+# Метрики воркеров пишутся в общий каталог; файлы прошлого запуска удаляем
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# Запуск Gunicorn с UvicornWorker (хуки метрик в gunicorn.conf.py)
 poetry run gunicorn main:app --workers 4 --worker-class uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000
@@ -0,0 +1,26 @@
+from app.core.bloom import BloomFilter
+
+
+def test_no_false_negatives():
+    bloom = BloomFilter(capacity=10000, error_rate=0.01)
+    keys = [f"user{i}" for i in range(10000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    assert bloom.count == len(keys)
+
+
+def test_false_positive_rate_near_target():
+    bloom = BloomFilter(capacity=10000, error_rate=0.01)
+    for i in range(10000):
+        bloom.add(f"user{i}")
+    false_positives = sum(f"other{i}" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.02
+
+
+def test_empty_filter_contains_nothing():
+    bloom = BloomFilter(capacity=0, error_rate=0.01)
+    assert bloom.size >= 8 and bloom.hashes >= 1
+    assert "anything" not in bloom
+    bloom.add("anything")
+    assert "anything" in bloom
@@ -0,0 +1,90 @@
+import pytest
+
+from app.core import cache
+from app.core.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+def test_get_and_stats(clock):
+    lru = TTLCache(maxsize=10, ttl=60)
+    assert lru.get("a", "missing") == "missing"
+    lru.set("a", 1)
+    assert lru.get("a") == 1
+    assert lru.stats == {"size": 1, "hits": 1, "misses": 1}
+
+
+def test_entries_expire(clock):
+    lru = TTLCache(maxsize=10, ttl=60)
+    lru.set("a", 1)
+    clock.now += 59
+    assert lru.get("a") == 1
+    clock.now += 1
+    assert lru.get("a") is None
+    # Просроченная запись удаляется при чтении
+    assert len(lru) == 0
+
+
+def test_entry_ttl_is_capped_by_cache_ttl(clock):
+    lru = TTLCache(maxsize=10, ttl=60)
+    lru.set("short", 1, ttl=5)
+    lru.set("long", 2, ttl=600)
+    clock.now += 10
+    assert lru.get("short") is None
+    assert lru.get("long") == 2
+    clock.now += 50
+    assert lru.get("long") is None
+
+
+def test_disabled_cache_stores_nothing(clock):
+    lru = TTLCache(maxsize=10, ttl=60)
+    lru.set("a", 1)
+    # Нулевой ttl убирает и прежнее значение
+    lru.set("a", 2, ttl=0)
+    assert lru.get("a") is None
+
+    empty = TTLCache(maxsize=0, ttl=60)
+    empty.set("a", 1)
+    assert len(empty) == 0
+
+
+def test_evicts_least_recently_used(clock):
+    lru = TTLCache(maxsize=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+
+    # Перезапись тоже делает ключ свежим
+    lru.set("a", 10)
+    lru.set("d", 4)
+    assert lru.get("c") is None
+    assert lru.get("a") == 10
+
+
+def test_invalidate_and_clear(clock):
+    lru = TTLCache(maxsize=10, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.invalidate("a")
+    lru.invalidate("missing")
+    assert lru.get("a") is None
+    assert len(lru) == 1
+    lru.clear()
+    assert len(lru) == 0
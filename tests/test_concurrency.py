@@ -0,0 +1,28 @@
+import asyncio
+
+
+def test_concurrent_writes_do_not_deadlock(client, user, run):
+    # Создание, добавление и снятие тега, удаление одного пользователя с общим тегом:
+    # все пути записи сначала блокируют строку пользователя, потом теги и счетчики
+    headers = user["headers"]
+    tag = f"{user['telegram_id']}-shared"
+
+    async def burst():
+        note_ids = []
+        for _ in range(10):
+            response = await client.post("/notes/notes/", headers=headers, json={"title": "t", "content": "c", "tags": []})
+            note_ids.append(response.json()["id"])
+
+        requests = [client.post("/notes/notes/", headers=headers, json={"title": "t", "content": "c", "tags": [tag]})
+                    for _ in range(30)]
+        requests += [client.post(f"/notes/notes/{note_id}/add_tag", headers=headers, params={"tag_name": tag})
+                     for note_id in note_ids]
+        requests += [client.post("/notes/batch/tags", headers=headers,
+                                 json={"operations": [{"note_id": note_id, "tag": tag, "action": "remove"}
+                                                      for note_id in note_ids]})
+                     for _ in range(5)]
+        requests += [client.delete(f"/notes/notes/{note_id}", headers=headers) for note_id in note_ids[:5]]
+        responses = await asyncio.gather(*requests)
+        return [response.text for response in responses if response.status_code >= 500]
+
+    assert run(burst()) == []
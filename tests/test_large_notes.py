@@ -0,0 +1,21 @@
+def test_multi_megabyte_note(client, user, run):
+    # Около 3.5 МБ разных слов: вектор всего текста больше предела tsvector в 1 МБ
+    headers = user["headers"]
+    content = "needle " + " ".join(f"word{i}" for i in range(400000))
+
+    async def write():
+        created = await client.post("/notes/notes/", headers=headers,
+                                    json={"title": "large", "content": content, "tags": []})
+        assert created.status_code == 200, created.text
+        note_id = created.json()["id"]
+
+        updated = await client.put(f"/notes/notes/{note_id}", headers=headers, json={"content": content + " more"})
+        assert updated.status_code == 200, updated.text
+
+        found = await client.get("/notes/notes/search/text", headers=headers, params={"q": "needle"})
+        assert found.status_code == 200, found.text
+        return note_id, [note["id"] for note in found.json()]
+
+    note_id, found = run(write())
+    # Начало текста по-прежнему ищется
+    assert note_id in found
@@ -0,0 +1,42 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from app.core.pagination import decode_cursor, decode_sync_cursor, encode_cursor, encode_sync_cursor
+
+
+def _raw(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    updated_at = datetime(2026, 10, 18, 12, 30, 15, 123456)
+    cursor = encode_cursor(updated_at, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (updated_at, 42)
+
+
+def test_sync_cursor_round_trip():
+    assert decode_sync_cursor(encode_sync_cursor(10 ** 12, 7)) == (10 ** 12, 7)
+
+
+@pytest.mark.parametrize("cursor", [
+    "", "not base64!", "ё", "////",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    _raw({}), _raw([]), _raw(["2026-10-18T12:00:00"]), _raw(["2026-10-18T12:00:00", 1, 2]),
+    _raw(["yesterday", 1]), _raw([1, 1]), _raw(["2026-10-18T12:00:00", "one"]),
+    _raw(["2026-10-18T12:00:00", None]),
+])
+def test_tampered_cursor(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("cursor", [
+    "", "not base64!", "ё", _raw({}), _raw([1]), _raw([1, 2, 3]), _raw(["x", 1]), _raw([None, 1]),
+])
+def test_tampered_sync_cursor(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_sync_cursor(cursor)
@@ -0,0 +1,31 @@
+import asyncio
+
+
+def test_cold_reads_fit_small_pool(client, user, run):
+    # Без реплики get_current_user и обработчик чтения делят одну сессию: запрос держит
+    # не больше одного соединения, и 20 параллельных запросов не упираются в пул из двух
+    from app.api.auth import user_cache
+
+    async def burst():
+        user_cache.clear()
+        responses = await asyncio.gather(*(client.get("/notes/notes/", headers=user["headers"])
+                                           for _ in range(20)))
+        return [response.status_code for response in responses]
+
+    assert run(burst()) == [200] * 20
+
+
+def test_pool_stats_survive_dispose(engine, run):
+    from sqlalchemy import text
+
+    from app.db.session import pool_status
+
+    async def reconnect():
+        before = pool_status(engine)["checkouts"]
+        await engine.dispose()
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return before, pool_status(engine)["checkouts"]
+
+    before, after = run(reconnect())
+    assert after == before + 1
@@ -0,0 +1,132 @@
+"""Число SQL-запросов на каждый обработчик заметок.
+
+Пользователь уже в кэше get_current_user, кэш ответов выключен, поэтому
+считаются только запросы самого обработчика. Изменение числа - повод
+разобраться, а не просто поправить ожидание.
+"""
+import pytest
+
+
+@pytest.fixture
+def api(client, user, run, statements):
+    """Вызов маршрута: ответ и выполненный при этом SQL."""
+    def call(method: str, url: str, headers: dict = None, **kwargs):
+        with statements() as executed:
+            response = run(client.request(method, url, headers={**user["headers"], **(headers or {})}, **kwargs))
+        assert response.status_code < 400, response.text
+        return response, executed
+
+    return call
+
+
+@pytest.fixture
+def note(api, user):
+    """Заметка пользователя с одним тегом."""
+    def create(title: str = "note", content: str = "lorem ipsum"):
+        response, _ = api("POST", "/notes/notes/", json={"title": title, "content": content,
+                                                         "tags": [f"{user['telegram_id']}-base"]})
+        return response.json()
+
+    return create
+
+
+def assert_queries(executed, expected: int):
+    assert len(executed) == expected, "\n\n".join(executed)
+
+
+def test_create_note(api, user):
+    # change_seq, INSERT заметки, SELECT и INSERT тегов, note_tag, user_tag_counts, NOTIFY
+    _, executed = api("POST", "/notes/notes/", json={"title": "t", "content": "c",
+                                                     "tags": [f"{user['telegram_id']}-a", f"{user['telegram_id']}-b"]})
+    assert_queries(executed, 7)
+    # Вектор поиска не возвращается из INSERT
+    assert executed[1].lstrip().startswith("INSERT INTO notes")
+    assert "search_vector" not in executed[1]
+
+
+def test_list_notes(api, note):
+    note()
+    note()
+    for params in ({}, {"limit": 10}, {"format": "ndjson"}, {"fields": "id,title", "include_content": "false"}):
+        _, executed = api("GET", "/notes/notes/", params=params)
+        assert_queries(executed, 1)
+
+
+def test_get_note(api, note):
+    note_id = note()["id"]
+    _, executed = api("GET", f"/notes/notes/{note_id}")
+    assert_queries(executed, 1)
+
+
+def test_get_note_content(api, note):
+    note_id = note()["id"]
+    response, executed = api("GET", f"/notes/notes/{note_id}/content")
+    # Хэш, затем текст
+    assert_queries(executed, 2)
+
+    # Совпавший ETag: текст не читается
+    response, executed = api("GET", f"/notes/notes/{note_id}/content",
+                             headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+    assert_queries(executed, 1)
+
+
+def test_update_note(api, note):
+    note_id = note()["id"]
+    # change_seq, UPDATE ... RETURNING, NOTIFY: без SELECT перед обновлением и refresh после
+    _, executed = api("PUT", f"/notes/notes/{note_id}", json={"content": "changed"})
+    assert_queries(executed, 3)
+    assert executed[1].lstrip().startswith("UPDATE notes")
+
+    _, executed = api("PUT", f"/notes/notes/{note_id}", json={})
+    assert_queries(executed, 1)
+
+
+def test_delete_note(api, note):
+    note_id = note()["id"]
+    # change_seq, note_tag, user_tag_counts (upsert и очистка нулей), notes, надгробие, NOTIFY
+    _, executed = api("DELETE", f"/notes/notes/{note_id}")
+    assert_queries(executed, 7)
+
+
+def test_add_tag(api, note, user):
+    note_id = note()["id"]
+    # заметка, change_seq, SELECT и INSERT тега, note_tag, user_tag_counts, UPDATE notes, NOTIFY
+    _, executed = api("POST", f"/notes/notes/{note_id}/add_tag", params={"tag_name": f"{user['telegram_id']}-new"})
+    assert_queries(executed, 8)
+
+
+def test_remove_tag(api, note, user):
+    note_id = note()["id"]
+    # заметка, change_seq, note_tag, user_tag_counts (upsert и очистка нулей), UPDATE notes, NOTIFY
+    _, executed = api("DELETE", f"/notes/notes/{note_id}/remove_tag",
+                      params={"tag_name": f"{user['telegram_id']}-base"})
+    assert_queries(executed, 7)
+
+
+def test_search(api, note, user):
+    note(title="needle")
+    # id тегов, затем заметки
+    _, executed = api("GET", "/notes/notes/search", params={"tags": f"{user['telegram_id']}-base"})
+    assert_queries(executed, 2)
+
+    _, executed = api("GET", "/notes/notes/search/text", params={"q": "needle", "highlight": "true"})
+    assert_queries(executed, 1)
+
+
+def test_tags(api, note):
+    note()
+    _, executed = api("GET", "/notes/tags")
+    assert_queries(executed, 1)
+
+
+def test_sync(api, note):
+    note()
+    response, executed = api("GET", "/notes/sync")
+    # Первая синхронизация: только изменения, удалять на клиенте нечего
+    assert_queries(executed, 1)
+
+    note()
+    _, executed = api("GET", "/notes/sync", params={"since": response.json()["next_cursor"]})
+    # Горизонт, изменения, удаления
+    assert_queries(executed, 3)
@@ -0,0 +1,136 @@
+"""Планы запросов обработчиков: ни один не читает растущие таблицы целиком.
+
+Данные засеваются в отдельную схему, чтобы не зависеть от других тестов.
+На маленькой базе планировщик честно выбирает Seq Scan, поэтому последовательное
+чтение запрещается через enable_seqscan = off: если подходящего индекса нет,
+план все равно останется с Seq Scan, и тест упадет. Какой из подходящих индексов
+выбран, решает планировщик, и тест это не проверяет.
+"""
+import json
+from datetime import datetime
+
+import pytest
+
+SCHEMA = "query_plans"
+
+# Таблицы, которые растут с числом пользователей и заметок
+CHECKED_TABLES = {"notes", "note_tag", "users", "user_tag_counts", "note_tombstones"}
+
+HANDLERS = ["check_user / login", "get_notes", "get_notes cursor", "get_notes tag", "get_note_by_id",
+            "get_note_content", "search tags any", "search tags all", "search text", "tags with counts",
+            "sync changes", "sync deletions"]
+
+SEED_SQL = [
+    "INSERT INTO users (telegram_id, hashed_password) "
+    "SELECT 'plan' || g, 'x' FROM generate_series(1, :users) g",
+    "INSERT INTO tags (name) SELECT 'tag' || g FROM generate_series(1, :tags) g",
+    # Редкое слово для полнотекстового поиска
+    "INSERT INTO notes (title, content, user_id) "
+    "SELECT 'note ' || g, CASE WHEN g % 1000 = 0 THEN 'needle' ELSE 'lorem ipsum dolor sit amet' END, "
+    "1 + g % :users FROM generate_series(1, :notes) g",
+    "INSERT INTO note_tag (note_id, tag_id) "
+    "SELECT DISTINCT n.id, 1 + floor(:tags * power(random(), 3))::int FROM notes n, generate_series(1, 3)",
+    "INSERT INTO user_tag_counts (user_id, tag_id, count) "
+    "SELECT n.user_id, nt.tag_id, count(*) FROM note_tag nt JOIN notes n ON n.id = nt.note_id "
+    "GROUP BY n.user_id, nt.tag_id",
+]
+
+
+def handler_queries():
+    """Запрос обработчика с параметрами."""
+    from sqlalchemy import func
+    from sqlalchemy.future import select
+
+    from app.db import models, queries
+
+    fields = tuple(queries.NOTE_COLUMNS)
+    ts_query = func.websearch_to_tsquery(models.SEARCH_CONFIG, "needle")
+    rank = func.ts_rank(models.Note.search_vector, ts_query).label("rank")
+    text_search = (select(*queries.note_columns(), rank)
+                   .filter(models.Note.user_id == 1)
+                   .filter(models.Note.search_vector.op("@@")(ts_query))
+                   .order_by(rank.desc(), models.Note.id.desc())
+                   .limit(50))
+    return {
+        "check_user / login": (queries.USER_BY_TELEGRAM_ID, {"telegram_id": "plan1"}),
+        "get_notes": (queries.notes_by_owner(fields, False, False, True), {"user_id": 1, "limit": 100}),
+        "get_notes cursor": (queries.notes_by_owner(fields, False, True, True),
+                             {"user_id": 1, "limit": 100, "cursor_updated_at": datetime.utcnow(),
+                              "cursor_id": 10 ** 9}),
+        "get_notes tag": (queries.notes_by_owner(fields, True, False, True),
+                          {"user_id": 1, "limit": 100, "tag": "tag1"}),
+        "get_note_by_id": (queries.NOTE_ROW_BY_OWNER, {"note_id": 1, "user_id": 1}),
+        "get_note_content": (queries.NOTE_CONTENT_BY_OWNER, {"note_id": 1, "user_id": 1}),
+        "search tags any": (queries.notes_by_tags("any"), {"user_id": 1, "tag_ids": [1, 2]}),
+        "search tags all": (queries.notes_by_tags("all"), {"user_id": 1, "tag_ids": [1, 2], "tag_count": 2}),
+        "search text": (text_search, {}),
+        "tags with counts": (queries.TAG_COUNTS_BY_USER, {"user_id": 1}),
+        "sync changes": (queries.NOTE_CHANGES, {"user_id": 1, "since_seq": 1, "since_id": 0, "limit": 101}),
+        "sync deletions": (queries.NOTE_DELETIONS, {"user_id": 1, "since_seq": 1, "since_id": 0, "limit": 101}),
+    }
+
+
+def walk(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+@pytest.fixture(scope="module")
+def plans(database_url, run):
+    """Узлы плана EXPLAIN каждого запроса обработчика."""
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.ext.compiler import compiles
+    from sqlalchemy.sql.expression import ClauseElement, Executable
+
+    from app.db import models
+
+    class Explain(Executable, ClauseElement):
+        inherit_cache = False
+
+        def __init__(self, statement):
+            self.statement = statement
+
+    @compiles(Explain, "postgresql")
+    def _compile_explain(element, compiler, **kw):
+        return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+    async def collect():
+        engine = create_async_engine(database_url, connect_args={"server_settings": {"search_path": SCHEMA}})
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+                await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+                await conn.run_sync(models.Base.metadata.create_all)
+                for sql in SEED_SQL:
+                    await conn.execute(text(sql), {"users": 100, "notes": 20000, "tags": 500})
+            async with engine.connect() as conn:
+                await conn.execution_options(isolation_level="AUTOCOMMIT")
+                await conn.execute(text("ANALYZE"))
+
+            result = {}
+            async with engine.connect() as conn:
+                await conn.execute(text("SET enable_seqscan = off"))
+                for name, (stmt, params) in handler_queries().items():
+                    raw = (await conn.execute(Explain(stmt), params)).scalar()
+                    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+                    result[name] = list(walk(plan))
+
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+            return result
+        finally:
+            await engine.dispose()
+
+    return run(collect())
+
+
+@pytest.mark.parametrize("name", HANDLERS)
+def test_handler_query_avoids_seq_scan(plans, name):
+    nodes = plans[name]
+    full = sorted({node["Relation Name"] for node in nodes
+                   if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in CHECKED_TABLES})
+    used = sorted({node["Index Name"] for node in nodes if "Index Name" in node})
+
+    assert not full, f"{name}: sequential scan of {', '.join(full)}, indexes used: {', '.join(used) or 'none'}"
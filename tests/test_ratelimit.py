@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+for module in ("fastapi", "jose", "passlib", "prometheus_client", "pydantic_settings", "redis"):
+    pytest.importorskip(module)
+
+
+@pytest.fixture(scope="module")
+def ratelimit(app_settings):
+    from app.core import ratelimit
+    return ratelimit
+
+
+class FakeRedis:
+    """Redis, в котором скрипт сверки возвращает заранее заданные PTTL по ключам."""
+
+    def __init__(self, pexpire=None, error=None):
+        self.pexpire = pexpire or {}
+        self.error = error
+        self.calls = []
+
+    def register_script(self, script):
+        async def run(keys, args):
+            self.calls.append((keys, args))
+            if self.error is not None:
+                raise self.error
+            return [self.pexpire.get(key, 0) for key in keys]
+        return run
+
+
+def test_parse_limits(ratelimit):
+    Limit = ratelimit.Limit
+    assert ratelimit.parse_limits("") == {}
+    assert ratelimit.parse_limits(" check_user=600/60 , login=10/60,") == {
+        "check_user": Limit(600, 60), "login": Limit(10, 60)}
+
+
+def test_parse_limits_zero_disables(ratelimit):
+    Limit = ratelimit.Limit
+    assert ratelimit.parse_limits("check_user=0") == {"check_user": Limit(0, 0)}
+    assert ratelimit.parse_limits("check_user=0/60") == {"check_user": Limit(0, 60)}
+
+
+@pytest.mark.parametrize("value, message", [
+    ("login=abc", "expected times/seconds or 0"),
+    ("login=10/", "expected times/seconds or 0"),
+    ("login", "expected times/seconds or 0"),
+    ("login=10", "window must be a positive"),
+    ("login=10/0", "window must be a positive"),
+    ("login=10/-5", "window must be a positive"),
+    ("=10/60", "route name is missing"),
+])
+def test_parse_limits_rejects(ratelimit, value, message):
+    with pytest.raises(ValueError, match=message):
+        ratelimit.parse_limits(value)
+
+
+def test_local_bucket(ratelimit):
+    backend = ratelimit.LocalBackend(max_keys=10)
+    limit = ratelimit.Limit(2, 60)
+
+    async def hits():
+        return [await backend.hit("key", 1, limit) for _ in range(3)]
+
+    first, second, third = asyncio.run(hits())
+    assert first == second == 0
+    # Одна единица пополняется за 30 секунд
+    assert third == pytest.approx(30, abs=0.1)
+
+
+def test_local_bucket_cost(ratelimit):
+    backend = ratelimit.LocalBackend(max_keys=10)
+    limit = ratelimit.Limit(10, 10)
+
+    async def hits():
+        return await backend.hit("key", 8, limit), await backend.hit("key", 8, limit)
+
+    first, second = asyncio.run(hits())
+    assert first == 0
+    assert second == pytest.approx(6, abs=0.1)
+
+
+def test_local_evicts_least_recent_key(ratelimit):
+    backend = ratelimit.LocalBackend(max_keys=2)
+    limit = ratelimit.Limit(1, 60)
+
+    async def hits():
+        await backend.hit("a", 1, limit)
+        await backend.hit("b", 1, limit)
+        await backend.hit("a", 1, limit)
+        await backend.hit("c", 1, limit)
+        # "a" использован позже "b" и по-прежнему исчерпан, "b" вытеснен и получает новый бакет
+        return await backend.hit("a", 1, limit), await backend.hit("b", 1, limit)
+
+    a, b = asyncio.run(hits())
+    assert b == 0
+    assert a > 0
+
+
+def test_hybrid_blocks_after_reconcile(ratelimit):
+    backend = ratelimit.HybridBackend(max_keys=10, flush_interval=3600)
+    redis = FakeRedis(pexpire={"hot": 5000})
+    backend.init(redis)
+    limit = ratelimit.Limit(100, 60)
+
+    async def scenario():
+        await backend.hit("hot", 2, limit)
+        await backend.hit("hot", 1, limit)
+        await backend.hit("cold", 1, limit)
+        await backend.flush()
+        result = await backend.hit("hot", 1, limit), await backend.hit("cold", 1, limit)
+        await backend.close()
+        return result
+
+    hot, cold = asyncio.run(scenario())
+    # Списания накоплены по ключам и ушли одним вызовом скрипта
+    keys, args = redis.calls[0]
+    assert dict(zip(keys, zip(args[::3], args[1::3], args[2::3]))) == {"hot": (3, 100, 60000),
+                                                                       "cold": (1, 100, 60000)}
+    assert hot == pytest.approx(5, abs=0.1)
+    assert cold == 0
+
+
+def test_hybrid_survives_redis_errors(ratelimit):
+    from redis.exceptions import ConnectionError
+
+    backend = ratelimit.HybridBackend(max_keys=10, flush_interval=3600)
+    backend.init(FakeRedis(error=ConnectionError("down")))
+    limit = ratelimit.Limit(100, 60)
+
+    async def scenario():
+        await backend.hit("key", 1, limit)
+        await backend.flush()
+        result = await backend.hit("key", 1, limit)
+        await backend.close()
+        return result
+
+    assert asyncio.run(scenario()) == 0
@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import pytest
+
+for module in ("asyncpg", "orjson", "prometheus_client", "pydantic_settings", "sqlalchemy", "starlette"):
+    pytest.importorskip(module)
+
+
+@pytest.fixture(scope="module")
+def users(app_settings):
+    from app.db import queries, users
+    return users, queries
+
+
+class Result:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeDB:
+    """Таблица users в словаре id -> telegram_id; считает запросы к базе."""
+
+    def __init__(self, queries, rows: dict):
+        self.queries = queries
+        self.rows = rows
+        self.executed = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute(self, statement, params=None):
+        self.executed += 1
+        if statement is self.queries.USERS_COUNT:
+            return Result(len(self.rows))
+        if statement is self.queries.USER_EXISTS:
+            return Result(params["telegram_id"] in self.rows.values())
+        raise AssertionError(f"unexpected statement {statement}")
+
+    async def stream(self, statement, params):
+        rows = sorted((user_id, telegram_id) for user_id, telegram_id in self.rows.items()
+                      if user_id > params["after_id"])
+
+        async def iterate():
+            for row in rows:
+                yield row
+        return iterate()
+
+
+class Hub:
+    def __init__(self, connected_at=None):
+        self.connected_at = connected_at
+        self.callbacks = {}
+
+    def listen(self, channel, callback):
+        self.callbacks[channel] = callback
+
+
+def _registered(users, hub=None):
+    registered = users.RegisteredUsers(1000, 0.01, known_size=100, known_ttl=60)
+    if hub is not None:
+        registered.follow(hub)
+    return registered
+
+
+def test_negatives_checked_in_db_without_notifications(users):
+    users, queries = users
+    db = FakeDB(queries, {1: "alice"})
+    registered = _registered(users)
+
+    async def scenario():
+        await registered.load(lambda: db, refresh_interval=0)
+        # Другой воркер зарегистрировал пользователя, уведомления не приходят
+        db.rows[2] = "bob"
+        db.executed = 0
+        return await registered.exists(db, "bob"), await registered.exists(db, "carol"), db.executed
+
+    assert asyncio.run(scenario()) == (True, False, 2)
+
+
+def test_negatives_final_after_refresh_following_connect(users):
+    users, queries = users
+    db = FakeDB(queries, {1: "alice"})
+    hub = Hub(connected_at=time.monotonic())
+    registered = _registered(users, hub)
+
+    async def scenario():
+        await registered.load(lambda: db, refresh_interval=0)
+        db.executed = 0
+        missing = await registered.exists(db, "carol")
+        return missing, db.executed, await registered.exists(db, "alice")
+
+    missing, executed, found = asyncio.run(scenario())
+    assert missing is False
+    assert executed == 0
+    assert found is True
+
+
+def test_reconnect_makes_negatives_uncertain(users):
+    users, queries = users
+    db = FakeDB(queries, {1: "alice"})
+    hub = Hub(connected_at=time.monotonic())
+    registered = _registered(users, hub)
+
+    async def scenario():
+        await registered.load(lambda: db, refresh_interval=0)
+        # Соединение LISTEN переподключилось после обновления: уведомления в разрыве могли потеряться
+        hub.connected_at = time.monotonic() + 1
+        db.rows[2] = "bob"
+        return await registered.exists(db, "bob")
+
+    assert asyncio.run(scenario()) is True
+
+
+def test_registration_notification_reaches_filter(users):
+    users, queries = users
+    db = FakeDB(queries, {1: "alice"})
+    hub = Hub(connected_at=time.monotonic())
+    registered = _registered(users, hub)
+
+    async def scenario():
+        await registered.load(lambda: db, refresh_interval=0)
+        db.rows[2] = "bob"
+        hub.callbacks[users.USERS_CHANNEL](None, 0, users.USERS_CHANNEL, "bob")
+        return await registered.exists(db, "bob")
+
+    assert asyncio.run(scenario()) is True
+
+
+def test_refresh_picks_up_rows_committed_out_of_order(users):
+    users, queries = users
+    db = FakeDB(queries, {1: "alice", 3: "carol"})
+    registered = _registered(users)
+
+    async def scenario():
+        await registered.load(lambda: db, refresh_interval=0.01)
+        # Транзакция с меньшим id зафиксирована позже
+        db.rows[2] = "bob"
+        db.rows[4] = "dave"
+        await asyncio.sleep(0.1)
+        await registered.close()
+        return "bob" in registered.bloom, "dave" in registered.bloom
+
+    assert asyncio.run(scenario()) == (True, True)
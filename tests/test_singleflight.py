@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+for module in ("prometheus_client", "sqlalchemy", "starlette"):
+    pytest.importorskip(module)
+
+from app.core.singleflight import SingleFlight  # noqa: E402
+
+
+class Producer:
+    """Вычисление, которое ждет разрешения и считает свои запуски."""
+
+    def __init__(self, body: bytes = b"body", error: Exception = None):
+        self.body = body
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> bytes:
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.body
+
+
+async def _started():
+    # Даем запущенным задачам дойти до ожидания
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_calls_share_one_computation():
+    async def scenario():
+        flight = SingleFlight()
+        produce = Producer()
+        calls = [asyncio.create_task(flight.do(1, "notes", "key", produce)) for _ in range(5)]
+        await _started()
+        produce.release.set()
+        return await asyncio.gather(*calls), produce.calls, flight._calls
+
+    bodies, calls, pending = asyncio.run(scenario())
+    assert bodies == [b"body"] * 5
+    assert calls == 1
+    assert pending == {}
+
+
+def test_different_keys_and_users_do_not_share():
+    async def scenario():
+        flight = SingleFlight()
+        produce = Producer()
+        produce.release.set()
+        await asyncio.gather(flight.do(1, "notes", "a", produce), flight.do(1, "notes", "b", produce),
+                             flight.do(1, "search", "a", produce), flight.do(2, "notes", "a", produce))
+        return produce.calls
+
+    assert asyncio.run(scenario()) == 4
+
+
+def test_error_reaches_every_waiter_and_is_not_kept():
+    async def scenario():
+        flight = SingleFlight()
+        failing = Producer(error=RuntimeError("boom"))
+        calls = [asyncio.create_task(flight.do(1, "notes", "key", failing)) for _ in range(3)]
+        await _started()
+        failing.release.set()
+        results = await asyncio.gather(*calls, return_exceptions=True)
+
+        # Следующий запрос считает заново, а не получает старую ошибку
+        retry = Producer(body=b"fresh")
+        retry.release.set()
+        return results, failing.calls, await flight.do(1, "notes", "key", retry)
+
+    results, calls, fresh = asyncio.run(scenario())
+    assert [str(result) for result in results] == ["boom"] * 3
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert calls == 1
+    assert fresh == b"fresh"
+
+
+def test_invalidate_user_detaches_running_computation():
+    async def scenario():
+        flight = SingleFlight()
+        before = Producer(body=b"before")
+        first = asyncio.create_task(flight.do(1, "notes", "key", before))
+        await _started()
+
+        # Запись пользователя: новый запрос не присоединяется к чтению, начатому до нее
+        flight.invalidate_user(1)
+        after = Producer(body=b"after")
+        second = asyncio.create_task(flight.do(1, "notes", "key", after))
+        await _started()
+        before.release.set()
+        after.release.set()
+        return await first, await second, flight._calls
+
+    first, second, pending = asyncio.run(scenario())
+    assert (first, second) == (b"before", b"after")
+    assert pending == {}
+
+
+def test_follower_recomputes_when_leader_is_cancelled():
+    async def scenario():
+        flight = SingleFlight()
+        produce = Producer()
+        leader = asyncio.create_task(flight.do(1, "notes", "key", produce))
+        await _started()
+        follower = asyncio.create_task(flight.do(1, "notes", "key", produce))
+        await _started()
+
+        leader.cancel()
+        await _started()
+        produce.release.set()
+        return await follower, leader.cancelled(), produce.calls
+
+    body, cancelled, calls = asyncio.run(scenario())
+    assert body == b"body"
+    assert cancelled
+    assert calls == 2
+
+
+def test_cancelled_follower_does_not_cancel_leader():
+    async def scenario():
+        flight = SingleFlight()
+        produce = Producer()
+        leader = asyncio.create_task(flight.do(1, "notes", "key", produce))
+        await _started()
+        follower = asyncio.create_task(flight.do(1, "notes", "key", produce))
+        await _started()
+
+        follower.cancel()
+        await _started()
+        produce.release.set()
+        return await leader, follower.cancelled()
+
+    assert asyncio.run(scenario()) == (b"body", True)